@@ -4,24 +4,30 @@ from tkinter import ttk, messagebox
 from pathlib import Path
 
 from PIL import Image, ImageTk
-import seaborn as sns
 import matplotlib.pyplot as plt
 import matplotlib.backends.backend_tkagg as backend_tkagg
-import networkx as nx
 from matplotlib.backends._backend_tk import NavigationToolbar2Tk
-from matplotlib.lines import Line2D
 
-import timeintegration_plotly
-from GUI_upload import file_import
-from shortest_path_1 import TramNetwork
+# seaborn, plotly (live view) and the upload dialog are imported when their
+# screens are first opened, networkx when the main window is built
 from db_handler import TramDatabase
 from db_operations import TramDatabaseOperations
+from heatmap_renderer import HeatmapCache
+from graph_layout import LayoutCache, layout_path_for
+from stop_name_index import StopNameIndex
+from gui_tasks import BackgroundTasks, ProgressIndicator
+from network_plot import NetworkPlot
 
 
 def gui_main():
-    global G, db, db_ops
+    from shortest_path_1 import TramNetwork  # networkx is loaded when the window opens, not on import
+
+    global G, db, db_ops, network_plot
     db = TramDatabase()
     db_ops = TramDatabaseOperations()
+    network_plot = None  # NetworkPlot on screen, kept between refreshes
+    heatmap_cache = HeatmapCache()
+    layout_cache = LayoutCache(layout_path_for(db.db_file))
 
     G = db.create_network_graph()
     network = TramNetwork()
@@ -79,14 +85,7 @@ def gui_main():
         tk.Label(stop_window, text=f"State: {state}",
                 font=HEADER_FONT, bg="#81B3E8").pack(pady=10)
 
-        heatmap_path = generate_heatmap_for_stop(stop_id)
-        if heatmap_path:
-            heatmap_img = Image.open(heatmap_path)
-            heatmap_img = heatmap_img.resize((960, 600), Image.Resampling.LANCZOS)
-            heatmap_photo = ImageTk.PhotoImage(heatmap_img)
-            heatmap_label = tk.Label(stop_window, image=heatmap_photo)
-            heatmap_label.image = heatmap_photo
-            heatmap_label.pack(pady=20)
+        show_heatmap(stop_window, stop_id, pady=20)
 
         tk.Button(stop_window, text="Close", command=stop_window.destroy,
                  font=BUTTON_FONT, bg="#3A7CA5", fg="white").pack(pady=20)
@@ -124,6 +123,7 @@ def gui_main():
         result_label = tk.Label(path_window, text="",
                               font=BODY_FONT, wraplength=700, bg="#E6F2FF")
         result_label.pack(pady=30)
+        path_progress = ProgressIndicator(path_window, "Finding path...", relx=0.5, rely=1.0, anchor='s', y=-10)
 
         def calculate_path():
             start = start_var.get()
@@ -136,16 +136,23 @@ def gui_main():
             start_id = start.split('(')[-1].rstrip(')')
             end_id = end.split('(')[-1].rstrip(')')
 
-            try:
-                path, duration = db_ops.find_shortest_path(start_id, end_id)
+            def show_path(result):
+                path, duration = result
                 if path:
                     result_text = f"Shortest path: {' → '.join(path)}\nDuration: {duration}"
                     result_label.config(text=result_text)
                 else:
                     result_label.config(text="No path found between these stops")
-            except Exception as e:
+
+            def show_error(e):
                 result_label.config(text=f"Error finding path: {str(e)}")
 
+            result_label.config(text="")
+            # Keyed, so a second click replaces a pending search instead of queueing behind it
+            tasks.submit(lambda task: db_ops.find_shortest_path(start_id, end_id), name='shortest path',
+                         key='shortest_path', owner=path_window, on_done=show_path, on_error=show_error,
+                         indicator=path_progress)
+
         tk.Button(path_window, text="Find Path", command=calculate_path,
                 bg="#3A7CA5", fg="white", font=BUTTON_FONT).pack(pady=20)
 
@@ -177,6 +184,21 @@ def gui_main():
     def on_button_click(button_text):
         print(f"{button_text} clicked")
 
+    # values list -> (values, StopNameIndex over it), built once per list instead of per keystroke
+    search_indexes = {}
+
+    def search_index_for(values):
+        cached = search_indexes.get(id(values))
+        if cached is None or cached[0] is not values:
+            cached = (values, StopNameIndex((value, value) for value in values))
+            search_indexes[id(values)] = cached
+        return cached[1]
+
+    def search_matches(typed, values, limit=None):
+        """Values matching typed text, diacritic-insensitive: prefix matches first, then substrings"""
+        index = search_index_for(values)
+        return [value for key in index.complete(typed, limit=limit) for value in index.values_for(key)]
+
     def search_combobox(event, combobox, values):
         """Filter combobox values based on typed text"""
         typed = combobox.get()
@@ -184,7 +206,7 @@ def gui_main():
             combobox['values'] = values
             return
 
-        filtered = [v for v in values if v.lower().startswith(typed.lower())]
+        filtered = search_matches(typed, values, limit=50)
         combobox['values'] = filtered
 
         if filtered:
@@ -192,17 +214,10 @@ def gui_main():
 
     def search_list(event, listbox, values):
         """Filter listbox values based on typed text"""
-        typed = event.widget.get().lower()
-        if not typed:
-            listbox.delete(0, tk.END)
-            for item in values:
-                listbox.insert(tk.END, item)
-            return
-
+        typed = event.widget.get()
         listbox.delete(0, tk.END)
-        for item in values:
-            if typed in item.lower():
-                listbox.insert(tk.END, item)
+        for item in (search_matches(typed, values) if typed else values):
+            listbox.insert(tk.END, item)
 
     #def start_dash():
         #open_search_window()
@@ -212,8 +227,13 @@ def gui_main():
         #webbrowser.open("http://127.0.0.1:8050")
 
     def realtime_map():
+        import timeintegration_plotly
         timeintegration_plotly.generate_live()
 
+    def file_import():
+        from GUI_upload import file_import
+        file_import()
+
     def load_tram_data():
         return db.get_all_tram_routes()
 
@@ -244,14 +264,7 @@ def gui_main():
         tk.Label(stop_window, text=f"Lines: {lines_str}", font=('Inter', 16, 'bold'), bg="#C4D8F2").pack(pady=5)
         tk.Label(stop_window, text=f"State: {state}", font=('Inter', 16, 'bold'), bg="#C4D8F2").pack(pady=5)
 
-        heatmap_path = generate_heatmap_for_stop(stop_id)
-        if heatmap_path:
-            heatmap_img = Image.open(heatmap_path)
-            heatmap_img = heatmap_img.resize((960, 600), Image.Resampling.LANCZOS)
-            heatmap_photo = ImageTk.PhotoImage(heatmap_img)
-            heatmap_label = tk.Label(stop_window, image=heatmap_photo)
-            heatmap_label.image = heatmap_photo
-            heatmap_label.pack(pady=10)
+        show_heatmap(stop_window, stop_id, pady=10)
 
         #tk.Button(stop_window, text="Close", command=stop_window.destroy,
                   #font=('Inter', 16), bg="#467D48", fg="white").pack(pady=10)
@@ -375,33 +388,45 @@ def gui_main():
                 if not traffic_file_path or not tram_file_path:
                     messagebox.showerror("Error", "Please upload both traffic data and tram hours files.")
                     return
-                try:
+                period = day_combo.get()
+                lines = line_entry.get()
+                hour = hour_combo.get()
+
+                if lines:
+                    try:
+                        lines = [int(x.strip()) for x in lines.split(',') if x.strip()]
+                    except:
+                        lines = [lines]
+                        return
+                else:
+                    lines = None
+
+                def optimize(task):
+                    task.progress("Reading input files...")
                     traffic_data = pd.read_csv(traffic_file_path)
                     tram_data = pd.read_csv(tram_file_path, delimiter=';')
-                    period = day_combo.get()
-                    lines = line_entry.get()
-                    hour = hour_combo.get()
-
-                    if lines:
-                        try:
-                            lines = [int(x.strip()) for x in lines.split(',') if x.strip()]
-                        except:
-                            lines = [lines]
-                            return
-                    else:
-                        lines = None
-
                     hours = [f"{int(hour):02d}:00:00"] if hour != 'None' else None
+                    task.progress("Allocating trips...")
+                    return process_data(traffic_data, tram_data, period, lines, hours)
 
+                def show_result(result):
                     global optimized_data
-                    optimized_data = process_data(traffic_data, tram_data, period, lines, hours)
+                    optimized_data = result
                     for widget in result_frame.winfo_children():
-                        widget.destroy()
+                        if widget is not optimization_progress:
+                            widget.destroy()
                     create_table(result_frame, optimized_data)
                     download_button.config(state=tk.NORMAL)
-                except Exception as e:
+                    run_button.config(state=tk.NORMAL)
+
+                def show_error(e):
+                    run_button.config(state=tk.NORMAL)
                     messagebox.showerror("Optimization failed", str(e))
 
+                run_button.config(state=tk.DISABLED)
+                optimization_tasks.submit(optimize, name='optimization', on_done=show_result,
+                                          on_error=show_error, indicator=optimization_progress)
+
             def create_table(parent, data):
                 tree = ttk.Treeview(parent, columns=list(data.columns), show='headings')
                 tree.pack(fill="both", expand=True)
@@ -454,6 +479,9 @@ def gui_main():
 
             result_frame = tk.Frame(window)
             result_frame.pack(fill="both", expand=True, padx=10, pady=10)
+            optimization_tasks = BackgroundTasks(window)
+            optimization_progress = ProgressIndicator(result_frame, "Optimizing...",
+                                                      on_cancel=lambda: run_button.config(state=tk.NORMAL))
 
             run_button = tk.Button(window, text="Optimize", command=run_optimization)
             run_button.pack(pady=(10, 0))
@@ -461,74 +489,49 @@ def gui_main():
             download_button = tk.Button(window, text="Download report", state=tk.DISABLED, command=download_report)
             download_button.pack(pady=(10, 0))
 
+            # This window has its own Tk root, so it can't share the main window's tasks; stop its pool on close
+            def on_close():
+                optimization_tasks.shutdown()
+                window.destroy()
+
+            window.protocol("WM_DELETE_WINDOW", on_close)
             window.mainloop()
 
         if __name__ == "__main__":
             gui_opt()
 
     def generate_heatmap_for_stop(stop):
-        traffic_data = db.get_traffic_data_for_stop(stop)
-
-        if not traffic_data:
+        # Rendered once per traffic data revision, then served from the on-disk cache
+        heatmap_path = heatmap_cache.get(stop)
+        if heatmap_path is None:
             print(f"No traffic data available for stop {stop}")
-            return None
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+        return heatmap_path
 
-        # Convert hours to integers and normalize values
-        processed_data = []
-        for day, hour, congestion in traffic_data:
-            try:
-                hour_int = int(float(hour))  # Handle both string and numeric hours
-                # Normalize congestion values (assuming they're percentages)
-                congestion_normalized = float(congestion) / 100  # Convert to 0-1 range
-                processed_data.append((day, hour_int, congestion_normalized))
-            except (ValueError, TypeError) as e:
-                print(f"Error processing data point: {day}, {hour}, {congestion} - {e}")
-
-        if not processed_data:
-            print("No valid data points after processing")
+    def load_heatmap_image(task, stop):
+        """Render the stop's heatmap and load it scaled for the stop window (background thread)"""
+        heatmap_path = generate_heatmap_for_stop(stop)
+        if not heatmap_path:
             return None
+        task.check()
+        heatmap_img = Image.open(heatmap_path)
+        return heatmap_img.resize((960, 600), Image.Resampling.LANCZOS)
+
+    def show_heatmap(stop_window, stop_id, **pack_options):
+        """Placeholder label in the stop window, filled in once the heatmap has rendered"""
+        heatmap_label = tk.Label(stop_window, bg=stop_window.cget('bg'))
+        heatmap_label.pack(**pack_options)
+
+        def on_done(heatmap_img):
+            if heatmap_img is None:
+                heatmap_label.destroy()
+                return
+            # PhotoImage has to be created on the Tk thread
+            heatmap_photo = ImageTk.PhotoImage(heatmap_img)
+            heatmap_label.config(image=heatmap_photo)
+            heatmap_label.image = heatmap_photo
 
-        # Get unique days and hours
-        days = sorted({day for day, hour, congestion in processed_data})
-        hours = sorted({hour for day, hour, congestion in processed_data})
-
-        # Create matrix (now with normalized 0-1 values)
-        traffic_matrix = []
-        for day in days:
-            day_row = []
-            for hour in hours:
-                # Find matching record (default to 0)
-                match = [c for d, h, c in processed_data if d == day and h == hour]
-                day_row.append(match[0] if match else 0)
-            traffic_matrix.append(day_row)
-
-        # Create heatmap with proper formatting
-        plt.figure(figsize=(15, 10))
-        ax = sns.heatmap(
-            traffic_matrix,
-            annot=True,
-            fmt=".0%",  # Format as percentages (e.g., 75%)
-            cmap="coolwarm",
-            vmin=0,
-            vmax=1,  # Ensure color scale is 0-100%
-            xticklabels=[f"{int(h):02d}:00" for h in hours],  # Ensure hours are integers
-            yticklabels=day_order
-        )
-
-        # Improve visualization
-        ax.set_title(f'Traffic Intensity at Stop {stop} (%)', pad=20)
-        ax.set_xlabel('Hour of Day', labelpad=15)
-        ax.set_ylabel('Day of Week', labelpad=15)
-        plt.yticks(rotation=0)  # Keep day labels horizontal
-        ax.figure.tight_layout()
-
-        # Save with higher DPI for better quality
-        heatmap_path = f'heatmap_{stop}.png'
-        plt.savefig(heatmap_path, dpi=120, bbox_inches='tight')
-        plt.close()
-
-        return heatmap_path
+        tasks.submit(load_heatmap_image, stop_id, name=f'heatmap {stop_id}', owner=heatmap_label,
+                     on_done=on_done, indicator=ProgressIndicator(stop_window, "Rendering heatmap..."))
 
     def add_delete_stop():
         global G  # Reference the global graph
@@ -906,14 +909,52 @@ def gui_main():
         tk.Button(direct_conn_tab, text="Add connection", command=connect).pack()
         tk.Button(del_conn_tab, text="Remove connection", command=delete_connection).pack()
 
-    def refresh_graph():
-        global G, toolbar
+    def load_graph_view(task):
+        """Network graph and its layout for drawing; runs off the Tk thread"""
+        graph = db.create_network_graph()
+        task.check()
+
+        pos = {n: tuple(data['pos']) for n, data in graph.nodes(data=True) if data.get('pos') is not None}
+
+        # Stops without coordinates are placed once per network revision and kept in the layout cache
+        if len(pos) < graph.number_of_nodes():
+            task.progress("Computing layout...")
+            pos = layout_cache.get(graph, revision=db.get_revision('network'), fixed=pos)
+
+        return {'graph': graph, 'pos': pos}
 
+    def refresh_graph():
+        """Reload and redraw the network in the background; a newer refresh supersedes a pending one"""
+        tasks.submit(load_graph_view, name='graph refresh', key='graph', on_done=draw_graph,
+                     on_error=show_graph_error, indicator=graph_progress)
+
+    def select_stop(stop_id):
+        """Open the stop window for a stop clicked on the network plot"""
+        stop_cb.set(f"{G.nodes[stop_id]['name']} ({stop_id})")
+        on_stop_select(None)
+
+    def clear_graph_frame():
+        global network_plot
+        network_plot = None
         for widget in graph_frame.winfo_children():
-            widget.destroy()
+            if widget is not graph_progress:
+                widget.destroy()
+
+    def draw_graph(view):
+        global G, toolbar, network_plot
 
         try:
-            G = db.create_network_graph()
+            G = view['graph']
+            pos = view['pos']
+
+            # The plot is already on screen: restyle the changed stops/edges in place
+            if network_plot is not None:
+                network_plot.update(G, pos)
+                network_plot.redraw()
+                return
+
+            clear_graph_frame()
+
             fig = plt.figure(figsize=(12, 9), dpi=100)
             ax = fig.add_subplot(111)
 
@@ -921,102 +962,44 @@ def gui_main():
             plt.axis('off')
             plt.tight_layout(pad=0)
 
-            pos = {n: data['pos'] for n, data in G.nodes(data=True) if 'pos' in data and data['pos'] is not None}
-
-            if not pos:
-                pos = nx.spring_layout(G, k=0.7, iterations=50, seed=42)
-            else:
-                pos = {n: (lat, lon) for n, (lat, lon) in pos.items()}
-
-            active_nodes = [n for n in G.nodes if G.nodes[n]['active']]
-            inactive_nodes = [n for n in G.nodes if not G.nodes[n]['active']]
-            active_edges = [e for e in G.edges if G.edges[e].get('active', False)]
-
-            terminal_nodes = [n for n in active_nodes if G.nodes[n]['name'].isupper()]
-            other_nodes = [n for n in active_nodes if not G.nodes[n]['name'].isupper()]
-
-            nx.draw_networkx_nodes(G, pos, nodelist=inactive_nodes, node_size=100,
-                                   node_color='#1a237e', alpha=0.5, node_shape='s', ax=ax)
-            nx.draw_networkx_nodes(G, pos, nodelist=other_nodes, node_size=150,
-                                   node_color='#1a237e', alpha=0.8, node_shape='o', ax=ax)
-            nx.draw_networkx_nodes(G, pos, nodelist=terminal_nodes, node_size=200,
-                                   node_color='#1a237e', alpha=1.0, node_shape='o', ax=ax)
-
-            nx.draw_networkx_edges(G, pos, edgelist=active_edges, width=1.5,
-                                   edge_color='#5D6D7E', alpha=0.8, arrows=True, arrowsize=10, ax=ax)
-
-            labels = {n: G.nodes[n]['name'] for n in terminal_nodes}
-            nx.draw_networkx_labels(G, pos, labels=labels,
-                                    font_size=7, font_weight='bold', ax=ax,
-                                    bbox=dict(facecolor='white', alpha=0.8, edgecolor='none',
-                                              boxstyle='round,pad=0.2'))
-
-            def hover(event):
-                if event.inaxes == ax:
-                    for node, (x, y) in pos.items():
-                        if ((x - event.xdata) ** 2 + (y - event.ydata) ** 2) < 0.0003:
-                            full_name = G.nodes[node]['name']
-                            annotation = ax.annotate(full_name,
-                                                     xy=(x, y),
-                                                     xytext=(10, 10),
-                                                     textcoords='offset points',
-                                                     bbox=dict(boxstyle='round,pad=0.5', fc='yellow', alpha=0.5),
-                                                     arrowprops=dict(arrowstyle='->'))
-                            fig.canvas.draw_idle()
-                            return
-                    for child in ax.get_children():
-                        if isinstance(child, plt.Annotation):
-                            child.remove()
-                            fig.canvas.draw_idle()
-
-            # Connect the hover function to the figure
-            #fig.canvas.mpl_connect('motion_notify_event', hover)
-
-            legend_elements = [
-                Line2D([0], [0], marker='o', color='w', label='Terminal Stop',
-                       markerfacecolor='#1a237e', markersize=8),
-                Line2D([0], [0], marker='o', color='w', label='Regular Stop',
-                       markerfacecolor='#1a237e', markersize=8, alpha=0.8),
-                Line2D([0], [0], marker='s', color='w', label='Inactive Stop',
-                       markerfacecolor='#1a237e', markersize=8, alpha=0.5),
-                Line2D([0], [0], color='#5D6D7E', lw=1.5, label='Active Connection')
-            ]
-            ax.legend(handles=legend_elements, loc='upper right', fontsize=7)
-            ax.set_title(f"Tram Network (Status: {len(active_nodes)}/{len(G.nodes())} active stops)",
-                         fontsize=9, pad=12)
-
-            if pos:
-                x_vals = [p[0] for p in pos.values()]
-                y_vals = [p[1] for p in pos.values()]
-                ax.set_xlim(min(x_vals) - 0.01, max(x_vals) + 0.01)
-                ax.set_ylim(min(y_vals) - 0.01, max(y_vals) + 0.01)
-
             container = tk.Frame(graph_frame)
             container.pack(fill=tk.BOTH, expand=True)
 
             canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=container)
+            plot = NetworkPlot(ax)
+            plot.attach(canvas)
+            # Tooltips on hover and click-to-open, except while zooming/panning with the toolbar
+            plot.enable_hover(on_click=select_stop, is_enabled=lambda: not toolbar.mode)
+            plot.update(G, pos)
             canvas.draw()
             canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
             toolbar = NavigationToolbar2Tk(canvas, container, pack_toolbar=False)
             toolbar.update()
             toolbar.pack(side=tk.BOTTOM, fill=tk.X)
+            network_plot = plot
 
         except Exception as e:
-            print(f"Graph error: {e}")
-            container = tk.Frame(graph_frame)
-            container.pack(fill=tk.BOTH, expand=True)
-            fig, ax = plt.subplots(figsize=(8, 6))
-            ax.text(0.5, 0.5, f"Błąd: {str(e)}", ha='center', va='center', fontsize=12)
-            ax.set_axis_off()
-            canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=container)
-            canvas.draw()
-            canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+            show_graph_error(e)
+
+    def show_graph_error(e):
+        print(f"Graph error: {e}")
+        clear_graph_frame()
+        container = tk.Frame(graph_frame)
+        container.pack(fill=tk.BOTH, expand=True)
+        fig, ax = plt.subplots(figsize=(8, 6))
+        ax.text(0.5, 0.5, f"Błąd: {str(e)}", ha='center', va='center', fontsize=12)
+        ax.set_axis_off()
+        canvas = backend_tkagg.FigureCanvasTkAgg(fig, master=container)
+        canvas.draw()
+        canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
     OUTPUT_PATH = Path(__file__).parent
     ASSETS_PATH = OUTPUT_PATH / Path("./assets")
 
     window = tk.Tk()
+    # Slow work (graph reloads, heatmaps, routing) runs here so the window stays responsive
+    tasks = BackgroundTasks(window)
     window.title("Tram network management and optimization")
     window.geometry("1600x1000")
     window.configure(bg="#C4D8F2")
@@ -1042,6 +1025,7 @@ def gui_main():
 
     graph_frame = tk.Frame(window, bg="#F0F8FF", height=850, width=1200)
     graph_frame.place(x=50, y=50)
+    graph_progress = ProgressIndicator(graph_frame, "Loading network...")
 
     rounded_rectangle(canvas, 1300, 25, 1580, 875, fill="#F0F8FF",
                       outline="#3A7CA5", width=2, radius=20)
@@ -1089,7 +1073,14 @@ def gui_main():
     create_stop_selector(window)
     refresh_graph()
 
+    def on_close():
+        tasks.shutdown()
+        window.destroy()
+
+    window.protocol("WM_DELETE_WINDOW", on_close)
     window.resizable(False, False)
     window.mainloop()
 
-gui_main()
\ No newline at end of file
+
+if __name__ == '__main__':
+    gui_main()
\ No newline at end of file
@@ -1,19 +1,31 @@
-from flask import Flask, jsonify, request, render_template
+from flask import Flask, jsonify, request, render_template, Response, stream_with_context
 from db_handler import TramDatabase
 from db_operations import TramDatabaseOperations
-from shortest_path_1 import TramNetwork
+from event_bus import ChangeLogRelay, event_bus, format_sse
+from stop_name_index import StopNameIndex
+from spatial_index import StopLocator
+from traffic_store import DAYS, DAY_INDEX, HOUR_LABELS, get_traffic_store
+import numpy as np
 from flask_cors import CORS
 import sqlite3
-from optimizer_from_db_and_xml import parse_xml_schedule_for_line, get_traffic_data_from_db, allocate_trips
-import pandas as pd
+import base64
+import gzip
+import hashlib
+import json
+import math
+import threading
+import time
 import io
 from flask import send_file
 import logging
-from variantdf import get_variants_for_line
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is used when brotli is not installed
+    brotli = None
 
 db = TramDatabase()
 db_ops = TramDatabaseOperations()
-network = TramNetwork()
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
@@ -25,64 +37,301 @@ def standard_response(success, data=None, message=None, status_code=200):
         "message": message
     }), status_code
 
+
+# pandas, networkx and the optimiser are imported inside the handlers that use
+# them, so starting the server only loads Flask, numpy and sqlite
+# (see startup_benchmark.py for the budget)
+
+# Derived views of the network (graph payload, search and spatial indexes),
+# shared across requests and rebuilt only when the network revision moves
+_network_cache = {}
+_network_cache_lock = threading.Lock()
+
+
+def network_cached(name, build):
+    """Result of build(revision) for the current network revision"""
+    revision = db.get_revision('network')
+    entry = _network_cache.get(name)
+    if entry is None or entry[0] != revision:
+        with _network_cache_lock:
+            entry = _network_cache.get(name)
+            if entry is None or entry[0] != revision:
+                entry = (revision, build(revision))
+                _network_cache[name] = entry
+    return entry[1]
+
 @app.route('/')
 def index():
     """Serve the main HTML file"""
     return render_template('main.html')
 
+# Listing parameters shared by the stop and connection endpoints:
+#   ?limit=&cursor=   keyset pagination, answered as {"items": [...], "next_cursor": ...}
+#   ?fields=a,b       sparse fieldsets
+#   ?name=&line=&active=&bbox=min_lng,min_lat,max_lng,max_lat   filters
+MAX_PAGE_SIZE = 500
+STOP_FIELDS = ('id', 'name', 'lat', 'lng', 'active_status', 'lines')
+CONNECTION_FIELDS = ('id', 'line', 'from', 'to', 'weight', 'active')
+# Points farther than this from the box around all stops are rejected by the nearest-stop lookups
+MAX_POINT_DISTANCE_M = 50_000
+
+
+def _parse_active(value):
+    if value is None:
+        return None
+    lowered = value.lower()
+    if lowered in ('yes', 'true', '1'):
+        return True
+    if lowered in ('no', 'false', '0'):
+        return False
+    raise ValueError("'active' must be yes/no")
+
+
+def _parse_bbox(value):
+    if value is None:
+        return None
+    try:
+        min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+    except ValueError:
+        raise ValueError("'bbox' must be min_lng,min_lat,max_lng,max_lat")
+    if not all(math.isfinite(bound) for bound in (min_lng, min_lat, max_lng, max_lat)) \
+            or max(abs(min_lat), abs(max_lat)) > 90 or max(abs(min_lng), abs(max_lng)) > 180:
+        raise ValueError("'bbox' must be valid coordinates")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def _parse_point(lat, lng):
+    """(lat, lng) as floats, rejecting non-finite values and points far outside the network"""
+    try:
+        lat, lng = float(lat), float(lng)
+    except (TypeError, ValueError):
+        raise ValueError("'lat'/'lng' must be numbers")
+    if not (math.isfinite(lat) and math.isfinite(lng)) or abs(lat) > 90 or abs(lng) > 180:
+        raise ValueError("'lat'/'lng' must be a valid coordinate")
+    if get_stop_locator().distance_to_bounds(lat, lng) > MAX_POINT_DISTANCE_M:
+        raise ValueError(f"Point is more than {MAX_POINT_DISTANCE_M // 1000} km outside the network")
+    return lat, lng
+
+
+def _parse_fields(available, default):
+    value = request.args.get('fields')
+    if not value:
+        return list(default)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(key, separators=(',', ':')).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(token, expected_type):
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+    except (ValueError, UnicodeError):
+        key = None
+    if not isinstance(key, expected_type):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def _page_args(cursor_type):
+    """(limit, decoded cursor); limit is None for the legacy whole-table response"""
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
+    if limit is None and cursor is None:
+        return None, None
+    limit = min(max(limit or MAX_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+    return limit, _decode_cursor(cursor, cursor_type) if cursor else None
+
+
+def _page(rows, limit, cursor_key, fields):
+    """Trim a limit+1 query result to one page and project the requested fields"""
+    next_cursor = _encode_cursor(cursor_key(rows[limit - 1])) if len(rows) > limit else None
+    return {
+        "items": [{field: row[field] for field in fields} for row in rows[:limit]],
+        "next_cursor": next_cursor
+    }
+
+
+def _query_stops(with_lines):
+    limit, after = _page_args(list)
+    if after is not None and len(after) != 2:
+        raise ValueError("Invalid cursor")
+    rows = db.query_stops(
+        name_prefix=request.args.get('name'),
+        line=request.args.get('line'),
+        active=_parse_active(request.args.get('active')),
+        bbox=_parse_bbox(request.args.get('bbox')),
+        after=tuple(after) if after else None,
+        limit=limit + 1 if limit else None,
+        with_lines=with_lines
+    )
+    return rows, limit
+
+
 # Stop Endpoints
 @app.route('/api/stops', methods=['GET'])
 def get_all_stops():
     try:
-        stops_data = db.get_stops_with_names_and_ids()
-        return standard_response(True, [{"id": id, "name": name} for id, name in stops_data])
+        fields = _parse_fields(STOP_FIELDS, ('id', 'name'))
+        rows, limit = _query_stops(with_lines='lines' in fields)
+    except ValueError as e:
+        return standard_response(False, message=str(e), status_code=400)
+    try:
+        if limit:
+            return standard_response(True, _page(rows, limit, lambda stop: [stop['name'], stop['id']], fields))
+        return standard_response(True, [{field: stop[field] for field in fields} for stop in rows])
     except Exception as e:
         return standard_response(False, message=str(e))
 
 
+def get_stop_search_index() -> StopNameIndex:
+    """Autocomplete index over stop names"""
+    return network_cached('stop_search', lambda revision: StopNameIndex(
+        (stop['name'], stop) for stop in db.query_stops()
+    ))
+
+
+def get_stop_locator() -> StopLocator:
+    """Grid index over stop coordinates"""
+    return network_cached('stop_locator', lambda revision: StopLocator(db.query_stops()))
+
+
+def _stop_summary(stop, distance=None):
+    summary = {key: stop[key] for key in ('id', 'name', 'lat', 'lng', 'active_status')}
+    if distance is not None:
+        summary['distance_m'] = round(distance, 1)
+    return summary
+
+
+@app.route('/api/stops/nearest', methods=['GET'])
+def get_nearest_stops():
+    """k stops nearest to a point: ?lat=&lng=&k=5&max_distance=<metres>&active=yes"""
+    lat = request.args.get('lat', type=float)
+    lng = request.args.get('lng', type=float)
+    if lat is None or lng is None:
+        return standard_response(False, message="Missing or invalid 'lat'/'lng'", status_code=400)
+    k = min(max(request.args.get('k', 5, type=int), 1), 100)
+    max_distance = request.args.get('max_distance', type=float)
+    try:
+        lat, lng = _parse_point(lat, lng)
+        if max_distance is not None and not (math.isfinite(max_distance) and max_distance >= 0):
+            raise ValueError("'max_distance' must be a non-negative number of metres")
+        active = _parse_active(request.args.get('active'))
+    except ValueError as e:
+        return standard_response(False, message=str(e), status_code=400)
+    try:
+        where = None if active is None else (lambda stop: (stop['active_status'] == 'yes') == active)
+        nearest = get_stop_locator().nearest(lat, lng, k=k, max_distance_m=max_distance, where=where)
+        return standard_response(True, [_stop_summary(stop, distance) for distance, stop in nearest])
+    except Exception as e:
+        return standard_response(False, message=str(e), status_code=500)
+
+
+@app.route('/api/stops/within', methods=['GET'])
+def get_stops_within():
+    """Stops inside a viewport: ?bbox=min_lng,min_lat,max_lng,max_lat&active=yes"""
+    try:
+        bbox = _parse_bbox(request.args.get('bbox'))
+        active = _parse_active(request.args.get('active'))
+        if bbox is None:
+            raise ValueError("Missing 'bbox'")
+    except ValueError as e:
+        return standard_response(False, message=str(e), status_code=400)
+    try:
+        stops = get_stop_locator().within_bbox(*bbox)
+        if active is not None:
+            stops = [stop for stop in stops if (stop['active_status'] == 'yes') == active]
+        stops.sort(key=lambda stop: (stop['name'], stop['id']))
+        return standard_response(True, [_stop_summary(stop) for stop in stops])
+    except Exception as e:
+        return standard_response(False, message=str(e), status_code=500)
+
+
+@app.route('/api/stops/autocomplete', methods=['GET'])
+def autocomplete_stops():
+    """Top stop matches for typed text: ?q=grunw&limit=10&active=yes"""
+    text = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    try:
+        active = _parse_active(request.args.get('active'))
+    except ValueError as e:
+        return standard_response(False, message=str(e), status_code=400)
+    try:
+        index = get_stop_search_index()
+        # The status filter can drop matches, so only then widen to every candidate key
+        keys = index.complete(text, limit=limit if active is None else None)
+        matches = []
+        for key in keys:
+            for stop in index.values_for(key):
+                if active is None or (stop['active_status'] == 'yes') == active:
+                    matches.append({'id': stop['id'], 'name': stop['name'], 'active_status': stop['active_status']})
+            if len(matches) >= limit:
+                break
+        return standard_response(True, matches[:limit])
+    except Exception as e:
+        return standard_response(False, message=str(e), status_code=500)
+
+
+def _traffic_rows(matrix):
+    """7 x 24 matrix as [day, hour, percent] rows in the old ORDER BY day_of_week, hour order"""
+    if matrix is None:
+        return []
+    rows = []
+    for day in sorted(DAYS):
+        values = matrix[DAY_INDEX[day]]
+        for hour in np.flatnonzero(~np.isnan(values)):
+            rows.append([day, HOUR_LABELS[hour], float(values[hour])])
+    return rows
+
+
+def get_stop_details_many(stop_ids):
+    """Details of many stops: network part cached per network revision, traffic from the shared store"""
+    cached = network_cached('stop_details', lambda revision: {})
+    missing = [stop_id for stop_id in stop_ids if stop_id not in cached]
+    if missing:
+        cached.update(db.get_stop_details(missing))
+
+    store = get_traffic_store(db.db_file)
+    details = {}
+    for stop_id in stop_ids:
+        if stop_id in cached:
+            details[stop_id] = dict(cached[stop_id], traffic=_traffic_rows(store.for_stop(stop_id)))
+    return details
+
+
 @app.route('/api/stops/<stop_id>', methods=['GET'])
 def get_stop_details(stop_id):
     try:
-        with db._get_connection() as conn:
-            cursor = conn.cursor()
+        details = get_stop_details_many([stop_id]).get(stop_id)
+        if not details:
+            return standard_response(False, message="Stop not found", status_code=404)
+        return standard_response(True, details)
+    except Exception as e:
+        return standard_response(False, message=str(e), status_code=500)
 
-            # Get basic stop info
-            cursor.execute('''
-                SELECT stop_id, stop_name, latitude, longitude, active_status
-                FROM stops WHERE stop_id = ?
-            ''', (stop_id,))
-            stop_info = cursor.fetchone()
-
-            if not stop_info:
-                return standard_response(False, message="Stop not found", status_code=404)
-
-            # Get lines serving this stop
-            cursor.execute('''
-                SELECT line_number FROM stop_line_relations
-                WHERE stop_id = ?
-            ''', (stop_id,))
-            lines = [row[0] for row in cursor.fetchall()]
 
-            # Get traffic data
-            cursor.execute('''
-                SELECT day_of_week, hour, congestion_percent
-                FROM traffic_patterns
-                WHERE stop_id = ?
-                ORDER BY day_of_week, hour
-            ''', (stop_id,))
-            traffic_data = cursor.fetchall()
-
-            return standard_response(True, {
-                "info": {
-                    "stop_id": stop_info[0],
-                    "stop_name": stop_info[1],
-                    "latitude": stop_info[2],
-                    "longitude": stop_info[3],
-                    "active_status": stop_info[4]
-                },
-                "lines": lines,
-                "traffic": traffic_data
-            })
+@app.route('/api/stops/details', methods=['GET', 'POST'])
+def get_stop_details_bulk():
+    """Details of many stops in one round trip: POST {"ids": [...]} or GET ?ids=a,b"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        stop_ids = data.get('ids')
+    else:
+        stop_ids = [stop_id for stop_id in request.args.get('ids', '').split(',') if stop_id]
+    if not isinstance(stop_ids, list) or not stop_ids or len(stop_ids) > MAX_PAGE_SIZE:
+        return standard_response(False, message=f"'ids' must list 1 to {MAX_PAGE_SIZE} stop ids", status_code=400)
+    try:
+        stop_ids = [str(stop_id) for stop_id in stop_ids]
+        details = get_stop_details_many(stop_ids)
+        return standard_response(True, {
+            "stops": details,
+            "missing": [stop_id for stop_id in dict.fromkeys(stop_ids) if stop_id not in details]
+        })
     except Exception as e:
         return standard_response(False, message=str(e), status_code=500)
 
@@ -90,33 +339,21 @@ def get_stop_details(stop_id):
 @app.route('/api/stops/status', methods=['GET'])
 def get_stops_by_status():
     try:
-        with db._get_connection() as conn:
-            cursor = conn.cursor()
+        fields = _parse_fields(STOP_FIELDS, ('id', 'name', 'active_status', 'lines'))
+        stops, limit = _query_stops(with_lines='lines' in fields)
+    except ValueError as e:
+        return standard_response(False, message=str(e), status_code=400)
+    try:
+        if limit:
+            return standard_response(True, _page(stops, limit, lambda stop: [stop['name'], stop['id']], fields))
+
+        def project(status):
+            return [{field: s[field] for field in fields} for s in stops if s['active_status'] == status]
 
-            # Get all stops with their line information
-            cursor.execute('''
-                SELECT s.stop_id, s.stop_name, s.active_status, 
-                       GROUP_CONCAT(DISTINCT slr.line_number) as lines
-                FROM stops s
-                LEFT JOIN stop_line_relations slr ON s.stop_id = slr.stop_id
-                GROUP BY s.stop_id
-                ORDER BY s.stop_name
-            ''')
-
-            stops = []
-            for row in cursor.fetchall():
-                stop_id, stop_name, active_status, lines = row
-                stops.append({
-                    'id': stop_id,
-                    'name': stop_name,
-                    'active_status': active_status,
-                    'lines': lines.split(',') if lines else []
-                })
-
-            return standard_response(True, {
-                'active': [s for s in stops if s['active_status'] == 'yes'],
-                'inactive': [s for s in stops if s['active_status'] == 'no']
-            })
+        return standard_response(True, {
+            'active': project('yes'),
+            'inactive': project('no')
+        })
     except Exception as e:
         return standard_response(False, message=str(e), status_code=500)
 
@@ -206,15 +443,22 @@ def delete_connection():
 @app.route('/api/connections', methods=['GET'])
 def get_all_connections():
     try:
-        connections = []
-        for from_stop, to_stop, weight in db.get_all_edges():
-            connections.append({
-                "from": from_stop,
-                "to": to_stop,
-                "weight": weight,
-                "active": db_ops.is_stop_active(from_stop) and db_ops.is_stop_active(to_stop)
-            })
-        return standard_response(True, connections)
+        fields = _parse_fields(CONNECTION_FIELDS, ('from', 'to', 'weight', 'active'))
+        limit, after = _page_args(int)
+        connections = db.query_connections(
+            line=request.args.get('line'),
+            stop=request.args.get('stop'),
+            active=_parse_active(request.args.get('active')),
+            bbox=_parse_bbox(request.args.get('bbox')),
+            after=after,
+            limit=limit + 1 if limit else None
+        )
+    except ValueError as e:
+        return standard_response(False, message=str(e), status_code=400)
+    try:
+        if limit:
+            return standard_response(True, _page(connections, limit, lambda connection: connection['id'], fields))
+        return standard_response(True, [{field: c[field] for field in fields} for c in connections])
     except Exception as e:
         return standard_response(False, message=str(e), status_code=500)
 
@@ -226,7 +470,24 @@ def find_shortest_path():
         if not all(key in data for key in ['start', 'end']):
             return standard_response(False, message="Missing start or end stop", status_code=400)
 
-        path, duration = db_ops.find_shortest_path(data['start'], data['end'])
+        # Either end may be a stop id or a {"lat", "lng"} point snapped to the nearest active stop
+        endpoints = []
+        for key in ('start', 'end'):
+            endpoint = data[key]
+            if isinstance(endpoint, dict):
+                try:
+                    lat, lng = _parse_point(endpoint.get('lat'), endpoint.get('lng'))
+                except ValueError as e:
+                    return standard_response(False, data={"path": [], "duration": ""},
+                                             message=f"Invalid {key}: {e}", status_code=400)
+                nearest = get_stop_locator().nearest(lat, lng, k=1, where=lambda stop: stop['active_status'] == 'yes')
+                if not nearest:
+                    return standard_response(False, data={"path": [], "duration": ""},
+                                             message=f"No active stop near {key}", status_code=404)
+                endpoint = nearest[0][1]['id']
+            endpoints.append(endpoint)
+
+        path, duration = db_ops.find_shortest_path(*endpoints)
         if not path:
             return standard_response(False, data={"path": [], "duration": ""}, message="No path found", status_code=404)
 
@@ -239,33 +500,36 @@ def find_shortest_path():
 
 
 # Network Graph Endpoint
-@app.route('/api/network/graph', methods=['GET'])
-def get_network_graph():
-    try:
-        G = db.create_network_graph()
-
-        nodes = []
-        for node, data in G.nodes(data=True):
-            pos = data.get('pos')
-            nodes.append({
-                "id": node,
-                "label": data.get('name', node),
-                "active": data.get('active', False),
-                "x": pos[0] if pos else None,  # longitude
-                "y": pos[1] if pos else None,  # latitude
-                "physics": pos is None  # Only enable physics for nodes without coordinates
-            })
-
-        edges = []
-        for u, v, data in G.edges(data=True):
-            edges.append({
-                "from": u,
-                "to": v,
-                "weight": data.get('weight', 1),
-                "label": str(data.get('weight', ''))
-            })
+# Pre-serialised graph response, rebuilt only when the network revision moves
+def _build_graph_payload(revision):
+    """Serialise the network graph once and keep compressed variants alongside"""
+    G = db.create_network_graph()
+
+    nodes = []
+    for node, data in G.nodes(data=True):
+        pos = data.get('pos')
+        nodes.append({
+            "id": node,
+            "label": data.get('name', node),
+            "active": data.get('active', False),
+            "x": pos[0] if pos else None,  # longitude
+            "y": pos[1] if pos else None,  # latitude
+            "physics": pos is None  # Only enable physics for nodes without coordinates
+        })
 
-        return standard_response(True, {
+    edges = []
+    for u, v, data in G.edges(data=True):
+        edges.append({
+            "from": u,
+            "to": v,
+            "weight": data.get('weight', 1),
+            "label": str(data.get('weight', ''))
+        })
+
+    body = json.dumps({
+        "success": True,
+        "data": {
+            "revision": revision,
             "nodes": nodes,
             "edges": edges,
             "options": {
@@ -283,37 +547,115 @@ def get_network_graph():
                     }
                 }
             }
+        },
+        "message": None
+    }, separators=(',', ':')).encode('utf-8')
+
+    return {
+        'revision': revision,
+        'etag': f"graph-{revision}-{hashlib.sha1(body).hexdigest()[:16]}",
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=6),
+        'br': brotli.compress(body) if brotli else None
+    }
+
+
+def get_graph_payload():
+    """Current graph payload, rebuilt at most once per network revision"""
+    return network_cached('graph', _build_graph_payload)
+
+
+@app.route('/api/network/graph', methods=['GET'])
+def get_network_graph():
+    try:
+        payload = get_graph_payload()
+
+        if request.if_none_match.contains_weak(payload['etag']):
+            response = Response(status=304)
+        else:
+            encodings = request.accept_encodings
+            if payload['br'] is not None and encodings['br']:
+                encoding = 'br'
+            elif encodings['gzip']:
+                encoding = 'gzip'
+            else:
+                encoding = 'identity'
+            response = Response(payload[encoding], mimetype='application/json')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+
+        # Weak tag: the same entity is served under several content encodings
+        response.set_etag(payload['etag'], weak=True)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['X-Network-Revision'] = str(payload['revision'])
+        return response
+    except Exception as e:
+        return standard_response(False, message=str(e), status_code=500)
+
+
+@app.route('/api/network/changes', methods=['GET'])
+def get_network_changes():
+    """Stop/connection changes after the client's revision, or reset=true if it must reload"""
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return standard_response(False, message="Missing or invalid 'since' revision", status_code=400)
+    try:
+        revision, changes = db.get_network_changes(since)
+        return standard_response(True, {
+            "revision": revision,
+            "reset": changes is None,
+            "changes": changes or []
         })
     except Exception as e:
         return standard_response(False, message=str(e), status_code=500)
 
 
+# Live updates
+@app.route('/api/events', methods=['GET'])
+def stream_events():
+    """Server-sent events: 'network' changes as they commit and 'optimization' job results.
+
+    The first event carries the current network revision so a client can
+    catch up on anything it missed through /api/network/changes.
+    """
+    subscription = event_bus.subscribe()
+    hello = {'id': None, 'type': 'hello', 'data': {'revision': db.get_revision('network')}}
+
+    def generate():
+        yield "retry: 5000\n\n"
+        yield format_sse(hello)
+        yield from event_bus.stream(subscription)
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # keep reverse proxies from buffering the stream
+    return response
+
+
 # Statistics Endpoint
+# Counters are maintained by triggers; this only spares the read for dashboards polling in a burst
+STATS_TTL = 5.0
+_stats_cache = {'expires': 0.0, 'data': None}
+
+
+@app.after_request
+def invalidate_stats_cache(response):
+    """Drop cached stats after any write so the next dashboard read is current"""
+    if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        _stats_cache['expires'] = 0.0
+    return response
+
+
 @app.route('/api/stats', methods=['GET'])
 def get_system_stats():
     try:
-        with db._get_connection() as conn:
-            cursor = conn.cursor()
-
-            # Total stops
-            cursor.execute("SELECT COUNT(*) FROM stops")
-            total_stops = cursor.fetchone()[0]
-
-            # Active stops
-            cursor.execute("SELECT COUNT(*) FROM stops WHERE active_status = 'yes'")
-            active_stops = cursor.fetchone()[0]
-
-            # Total routes (distinct line numbers)
-            cursor.execute("SELECT COUNT(DISTINCT line_number) FROM connections")
-            total_routes_result = cursor.fetchone()
-            total_routes = total_routes_result[0] if total_routes_result else 0
-
-            return standard_response(True, {
-                'total_stops': total_stops,
-                'active_stops': active_stops,
-                'total_routes': total_routes,
-                'recent_activity': []
-            })
+        now = time.monotonic()
+        if _stats_cache['data'] is None or now >= _stats_cache['expires']:
+            stats = db.get_system_stats()
+            stats['recent_activity'] = []
+            _stats_cache.update(data=stats, expires=now + STATS_TTL)
+        return standard_response(True, _stats_cache['data'])
     except Exception as e:
         app.logger.error(f"Error in stats endpoint: {str(e)}")
         return standard_response(False, message=str(e), status_code=500)
@@ -357,9 +699,17 @@ def optimize_schedule():
         optimization_result = optimize_without_merging(line, day_type, variant_id)
 
         # Convert optimization result to JSON-serializable format
+        import pandas as pd
         if isinstance(optimization_result, pd.DataFrame):
             optimization_result = optimization_result.to_dict(orient='records')
 
+        event_bus.publish('optimization', {
+            'job': 'optimize',
+            'lines': [line],
+            'day_type': day_type,
+            'variant': variant_id,
+            'rows': len(optimization_result) if optimization_result else 0
+        })
         return standard_response(True, data=optimization_result, message="Optimization successful")
 
     except Exception as e:
@@ -382,6 +732,13 @@ def download_optimized_schedule():
         results = optimize_lines(None, line_numbers, day_type=day_type, variant=variant)
         if not results:
             return standard_response(False, message="No data to export", status_code=404)
+        event_bus.publish('optimization', {
+            'job': 'download',
+            'lines': line_numbers,
+            'day_type': day_type,
+            'variant': variant,
+            'rows': len(results)
+        })
         import pandas as pd
         df = pd.DataFrame(results)
         output = io.StringIO()
@@ -398,11 +755,10 @@ def download_optimized_schedule():
         return standard_response(False, message=str(e), status_code=500)
 
 
-from variantdf import get_variant_names_for_line
-
 @app.route('/api/variants/<line_no>', methods=['GET'])
 def get_variants(line_no):
     try:
+        from variantdf import get_variant_names_for_line
         clean_line_no = int(line_no)
         variants = get_variant_names_for_line(clean_line_no)
 
@@ -412,5 +768,34 @@ def get_variants(line_no):
         app.logger.error(f"Variant fetch error for line {line_no}: {e}")
         return standard_response(False, message=str(e), status_code=500)
 
+def warm_up():
+    """Build the per-process caches up front so the first requests don't pay for them.
+
+    Run once in the gunicorn master with preload_app, so forked workers start
+    with the graph, indexes and traffic cube already in (copy-on-write) memory.
+    """
+    db.ensure_schema()
+    get_graph_payload()
+    get_stop_search_index()
+    get_stop_locator()
+    get_traffic_store(db.db_file)
+    db_ops.routing_network()
+    app.logger.info(f"Warmed up at network revision {db.get_revision('network')}")
+
+
+_change_relay = None
+
+
+def start_change_relay(interval=0.5):
+    """Multi-worker mode: relay committed changes from the shared change log to this worker's SSE clients"""
+    global _change_relay
+    if _change_relay is None:
+        # The relay becomes the only publisher, so local writes are not announced twice
+        db_ops.events = None
+        _change_relay = ChangeLogRelay(db, event_bus, interval=interval)
+        _change_relay.start()
+    return _change_relay
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
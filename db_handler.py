@@ -1,6 +1,213 @@
+import json
 import sqlite3
-from typing import Dict, List, Tuple, Optional, Set
-import networkx as nx
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Sequence, Set
+
+if TYPE_CHECKING:
+    import networkx as nx
+
+
+# Revision counters bumped by triggers, so in-memory caches can tell when a table changed
+SCHEMA_EXTENSIONS = '''
+CREATE TABLE IF NOT EXISTS data_revisions (
+    name TEXT PRIMARY KEY,
+    revision INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO data_revisions (name, revision) VALUES ('traffic', 0);
+INSERT OR IGNORE INTO data_revisions (name, revision) VALUES ('network', 0);
+
+-- Writers that bump a revision once per transaction themselves hold a guard row for it,
+-- so the per-row triggers below only count writes made any other way
+CREATE TABLE IF NOT EXISTS revision_guards (
+    name TEXT PRIMARY KEY
+);
+
+-- Replaced by the guarded traffic_patterns_revision_* triggers
+DROP TRIGGER IF EXISTS traffic_patterns_after_insert;
+DROP TRIGGER IF EXISTS traffic_patterns_after_update;
+DROP TRIGGER IF EXISTS traffic_patterns_after_delete;
+CREATE TRIGGER IF NOT EXISTS traffic_patterns_revision_after_insert AFTER INSERT ON traffic_patterns
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'traffic')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'traffic';
+END;
+CREATE TRIGGER IF NOT EXISTS traffic_patterns_revision_after_update AFTER UPDATE ON traffic_patterns
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'traffic')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'traffic';
+END;
+CREATE TRIGGER IF NOT EXISTS traffic_patterns_revision_after_delete AFTER DELETE ON traffic_patterns
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'traffic')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'traffic';
+END;
+
+-- One row per stop/connection mutation, tagged with the network revision it produced
+CREATE TABLE IF NOT EXISTS network_changes (
+    revision INTEGER PRIMARY KEY,
+    entity TEXT NOT NULL,
+    action TEXT NOT NULL,
+    entity_key TEXT NOT NULL,
+    payload TEXT,
+    changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Any writer of the network tables (import scripts, manual edits) moves the network revision.
+-- TramDatabaseOperations bumps and logs it once per change under a guard, so its logged
+-- revisions stay consecutive.
+CREATE TRIGGER IF NOT EXISTS stops_after_insert AFTER INSERT ON stops
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS stops_after_update AFTER UPDATE ON stops
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS stops_after_delete AFTER DELETE ON stops
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS connections_after_insert AFTER INSERT ON connections
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS connections_after_update AFTER UPDATE ON connections
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS connections_after_delete AFTER DELETE ON connections
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS stop_line_relations_after_insert AFTER INSERT ON stop_line_relations
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS stop_line_relations_after_update AFTER UPDATE ON stop_line_relations
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+CREATE TRIGGER IF NOT EXISTS stop_line_relations_after_delete AFTER DELETE ON stop_line_relations
+WHEN NOT EXISTS (SELECT 1 FROM revision_guards WHERE name = 'network')
+BEGIN
+    UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network';
+END;
+
+-- Listing indexes: keyset order by name, case-insensitive prefix (LIKE), line and bbox filters
+CREATE INDEX IF NOT EXISTS idx_stops_name ON stops (stop_name, stop_id);
+CREATE INDEX IF NOT EXISTS idx_stops_name_nocase ON stops (stop_name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_stops_active_name ON stops (active_status, stop_name, stop_id);
+CREATE INDEX IF NOT EXISTS idx_stops_coordinates ON stops (latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_stop_line_relations_line ON stop_line_relations (line_number, stop_id);
+CREATE INDEX IF NOT EXISTS idx_connections_from ON connections (from_stop);
+CREATE INDEX IF NOT EXISTS idx_connections_to ON connections (to_stop);
+
+-- Dashboard figures kept current by triggers so reading them never scans the network tables.
+-- INSERT OR REPLACE only fires the delete triggers with PRAGMA recursive_triggers = ON,
+-- which _get_connection enables. Trigger bodies avoid OR IGNORE: an outer OR REPLACE overrides it.
+CREATE TABLE IF NOT EXISTS stats_counters (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS line_stats (
+    line_number TEXT PRIMARY KEY,
+    connections INTEGER NOT NULL DEFAULT 0,
+    inactive_stops INTEGER NOT NULL DEFAULT 0
+);
+
+-- Seed from the current tables the first time (line_stats before the counters it keys off)
+INSERT INTO line_stats (line_number, connections, inactive_stops)
+SELECT l.line_number,
+       (SELECT COUNT(*) FROM connections c WHERE c.line_number = l.line_number),
+       (SELECT COUNT(*) FROM stop_line_relations r JOIN stops s ON s.stop_id = r.stop_id
+        WHERE r.line_number = l.line_number AND s.active_status = 'no')
+FROM (SELECT line_number FROM connections UNION SELECT line_number FROM stop_line_relations) l
+WHERE NOT EXISTS (SELECT 1 FROM stats_counters);
+INSERT INTO stats_counters (name, value)
+SELECT name, value FROM (
+    SELECT 'total_stops' AS name, (SELECT COUNT(*) FROM stops) AS value
+    UNION ALL SELECT 'active_stops', (SELECT COUNT(*) FROM stops WHERE active_status = 'yes')
+    UNION ALL SELECT 'connections', (SELECT COUNT(*) FROM connections)
+    UNION ALL SELECT 'weight_sum', (SELECT COALESCE(SUM(weight), 0) FROM connections)
+)
+WHERE NOT EXISTS (SELECT 1 FROM stats_counters);
+
+CREATE TRIGGER IF NOT EXISTS stats_stops_after_insert AFTER INSERT ON stops
+BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'total_stops';
+    UPDATE stats_counters SET value = value + (NEW.active_status = 'yes') WHERE name = 'active_stops';
+    UPDATE line_stats SET inactive_stops = inactive_stops + 1
+    WHERE NEW.active_status = 'no'
+      AND line_number IN (SELECT line_number FROM stop_line_relations WHERE stop_id = NEW.stop_id);
+END;
+CREATE TRIGGER IF NOT EXISTS stats_stops_after_delete AFTER DELETE ON stops
+BEGIN
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'total_stops';
+    UPDATE stats_counters SET value = value - (OLD.active_status = 'yes') WHERE name = 'active_stops';
+    UPDATE line_stats SET inactive_stops = inactive_stops - 1
+    WHERE OLD.active_status = 'no'
+      AND line_number IN (SELECT line_number FROM stop_line_relations WHERE stop_id = OLD.stop_id);
+END;
+CREATE TRIGGER IF NOT EXISTS stats_stops_after_status AFTER UPDATE OF active_status ON stops
+WHEN OLD.active_status IS NOT NEW.active_status
+BEGIN
+    UPDATE stats_counters SET value = value + (NEW.active_status = 'yes') - (OLD.active_status = 'yes')
+    WHERE name = 'active_stops';
+    UPDATE line_stats SET inactive_stops = inactive_stops + (NEW.active_status = 'no') - (OLD.active_status = 'no')
+    WHERE line_number IN (SELECT line_number FROM stop_line_relations WHERE stop_id = NEW.stop_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_connections_after_insert AFTER INSERT ON connections
+BEGIN
+    UPDATE stats_counters SET value = value + 1 WHERE name = 'connections';
+    UPDATE stats_counters SET value = value + NEW.weight WHERE name = 'weight_sum';
+    INSERT INTO line_stats (line_number)
+    SELECT NEW.line_number WHERE NOT EXISTS (SELECT 1 FROM line_stats WHERE line_number = NEW.line_number);
+    UPDATE line_stats SET connections = connections + 1 WHERE line_number = NEW.line_number;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_connections_after_delete AFTER DELETE ON connections
+BEGIN
+    UPDATE stats_counters SET value = value - 1 WHERE name = 'connections';
+    UPDATE stats_counters SET value = value - OLD.weight WHERE name = 'weight_sum';
+    UPDATE line_stats SET connections = connections - 1 WHERE line_number = OLD.line_number;
+END;
+CREATE TRIGGER IF NOT EXISTS stats_connections_after_update AFTER UPDATE OF line_number, weight ON connections
+BEGIN
+    UPDATE stats_counters SET value = value + NEW.weight - OLD.weight WHERE name = 'weight_sum';
+    UPDATE line_stats SET connections = connections - 1 WHERE line_number = OLD.line_number;
+    INSERT INTO line_stats (line_number)
+    SELECT NEW.line_number WHERE NOT EXISTS (SELECT 1 FROM line_stats WHERE line_number = NEW.line_number);
+    UPDATE line_stats SET connections = connections + 1 WHERE line_number = NEW.line_number;
+END;
+
+CREATE TRIGGER IF NOT EXISTS stats_stop_lines_after_insert AFTER INSERT ON stop_line_relations
+BEGIN
+    INSERT INTO line_stats (line_number)
+    SELECT NEW.line_number WHERE NOT EXISTS (SELECT 1 FROM line_stats WHERE line_number = NEW.line_number);
+    UPDATE line_stats SET inactive_stops = inactive_stops + 1
+    WHERE line_number = NEW.line_number
+      AND EXISTS (SELECT 1 FROM stops WHERE stop_id = NEW.stop_id AND active_status = 'no');
+END;
+CREATE TRIGGER IF NOT EXISTS stats_stop_lines_after_delete AFTER DELETE ON stop_line_relations
+BEGIN
+    UPDATE line_stats SET inactive_stops = inactive_stops - 1
+    WHERE line_number = OLD.line_number
+      AND EXISTS (SELECT 1 FROM stops WHERE stop_id = OLD.stop_id AND active_status = 'no');
+END;
+'''
+
+# Number of network revisions kept in network_changes; older clients must reload fully
+CHANGE_LOG_RETENTION = 1000
+
+# Database files whose schema extensions were already applied in this process
+_schema_ready: Set[str] = set()
 
 
 class TramDatabase:
@@ -9,9 +216,240 @@ class TramDatabase:
 
     def _get_connection(self):
         """Get a new thread-safe database connection"""
-        return sqlite3.connect(self.db_file, check_same_thread=False)
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        # Let INSERT OR REPLACE fire delete triggers so the stats counters stay exact
+        conn.execute('PRAGMA recursive_triggers = ON')
+        return conn
+
+    def ensure_schema(self):
+        """Create revision tables and triggers if the database predates them"""
+        if self.db_file in _schema_ready:
+            return
+        with self._get_connection() as conn:
+            conn.executescript(SCHEMA_EXTENSIONS)
+        _schema_ready.add(self.db_file)
+
+    def get_revision(self, name: str) -> int:
+        """Get the current revision counter of a tracked table group"""
+        self.ensure_schema()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT revision FROM data_revisions WHERE name = ?', (name,))
+            row = cursor.fetchone()
+            return row[0] if row else 0
+
+    def get_network_changes(self, since: int) -> Tuple[int, Optional[List[Dict]]]:
+        """Get (current revision, changes after `since`).
+
+        Changes are None when the log no longer covers `since` (pruned, or the
+        revision predates the log), in which case the client has to reload.
+        """
+        self.ensure_schema()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT revision FROM data_revisions WHERE name = 'network'")
+            row = cursor.fetchone()
+            current = row[0] if row else 0
+            if since == current:
+                return current, []
+            if since > current:
+                return current, None
+
+            cursor.execute('''
+                SELECT revision, entity, action, entity_key, payload
+                FROM network_changes
+                WHERE revision > ?
+                ORDER BY revision
+            ''', (since,))
+            rows = cursor.fetchall()
+            if not rows or rows[0][0] != since + 1 or rows[-1][0] != current:
+                return current, None
+
+            return current, [{
+                'revision': revision,
+                'entity': entity,
+                'action': action,
+                'key': entity_key,
+                'data': json.loads(payload) if payload else None
+            } for revision, entity, action, entity_key, payload in rows]
+
+    def get_system_stats(self) -> Dict:
+        """Dashboard figures read from the trigger-maintained summary tables"""
+        self.ensure_schema()
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name, value FROM stats_counters')
+            counters = dict(cursor.fetchall())
+            cursor.execute('SELECT line_number, connections, inactive_stops FROM line_stats ORDER BY line_number')
+            line_rows = cursor.fetchall()
+
+        total_stops = int(counters.get('total_stops', 0))
+        active_stops = int(counters.get('active_stops', 0))
+        total_connections = int(counters.get('connections', 0))
+        return {
+            'total_stops': total_stops,
+            'active_stops': active_stops,
+            'inactive_stops': total_stops - active_stops,
+            'total_routes': sum(1 for _, connections, _ in line_rows if connections > 0),
+            'total_connections': total_connections,
+            'average_edge_weight': counters.get('weight_sum', 0) / total_connections if total_connections else 0,
+            'connections_per_line': {line: connections for line, connections, _ in line_rows if connections > 0},
+            'inactive_stops_by_line': {line: inactive for line, _, inactive in line_rows if inactive > 0}
+        }
+
+    # Filtered, keyset-paginated listings
+    def query_stops(self, name_prefix: Optional[str] = None, line: Optional[str] = None,
+                    active: Optional[bool] = None, bbox: Optional[Tuple[float, float, float, float]] = None,
+                    after: Optional[Tuple[str, str]] = None, limit: Optional[int] = None,
+                    with_lines: bool = False) -> List[Dict]:
+        """Stops ordered by (name, id), optionally starting after a (name, id) keyset cursor.
+
+        bbox is (min_lng, min_lat, max_lng, max_lat).
+        """
+        self.ensure_schema()
+        conditions, params = [], []
+        if name_prefix:
+            escaped = name_prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            conditions.append("s.stop_name LIKE ? ESCAPE '\\'")
+            params.append(escaped + '%')
+        if line is not None:
+            conditions.append('s.stop_id IN (SELECT stop_id FROM stop_line_relations WHERE line_number = ?)')
+            params.append(line)
+        if active is not None:
+            conditions.append('s.active_status = ?')
+            params.append('yes' if active else 'no')
+        if bbox is not None:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            conditions.append('s.latitude BETWEEN ? AND ? AND s.longitude BETWEEN ? AND ?')
+            params.extend([min_lat, max_lat, min_lng, max_lng])
+        if after is not None:
+            conditions.append('(s.stop_name > ? OR (s.stop_name = ? AND s.stop_id > ?))')
+            params.extend([after[0], after[0], after[1]])
+
+        lines_column = ''
+        if with_lines:
+            lines_column = ''',
+                   (SELECT GROUP_CONCAT(line_number) FROM
+                       (SELECT DISTINCT line_number FROM stop_line_relations r WHERE r.stop_id = s.stop_id))'''
+        query = f'''
+            SELECT s.stop_id, s.stop_name, s.latitude, s.longitude, s.active_status{lines_column}
+            FROM stops s
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY s.stop_name, s.stop_id
+        '''
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            stops = []
+            for row in cursor.fetchall():
+                stop = {
+                    'id': row[0],
+                    'name': row[1],
+                    'lat': row[2],
+                    'lng': row[3],
+                    'active_status': row[4]
+                }
+                if with_lines:
+                    stop['lines'] = row[5].split(',') if row[5] else []
+                stops.append(stop)
+            return stops
+
+    def query_connections(self, line: Optional[str] = None, stop: Optional[str] = None,
+                          active: Optional[bool] = None, bbox: Optional[Tuple[float, float, float, float]] = None,
+                          after: Optional[int] = None, limit: Optional[int] = None) -> List[Dict]:
+        """Connections ordered by connection_id, optionally starting after a connection_id cursor.
+
+        active filters on both end stops being active; bbox keeps connections
+        with either end inside (min_lng, min_lat, max_lng, max_lat).
+        """
+        self.ensure_schema()
+        conditions, params = [], []
+        if line is not None:
+            conditions.append('c.line_number = ?')
+            params.append(line)
+        if stop is not None:
+            conditions.append('c.connection_id IN (SELECT connection_id FROM connections WHERE from_stop = ? '
+                              'UNION SELECT connection_id FROM connections WHERE to_stop = ?)')
+            params.extend([stop, stop])
+        if active is not None:
+            both_active = "(s1.active_status = 'yes' AND s2.active_status = 'yes')"
+            conditions.append(both_active if active else f'NOT {both_active}')
+        if bbox is not None:
+            min_lng, min_lat, max_lng, max_lat = bbox
+            conditions.append('((s1.latitude BETWEEN ? AND ? AND s1.longitude BETWEEN ? AND ?) '
+                              'OR (s2.latitude BETWEEN ? AND ? AND s2.longitude BETWEEN ? AND ?))')
+            params.extend([min_lat, max_lat, min_lng, max_lng] * 2)
+        if after is not None:
+            conditions.append('c.connection_id > ?')
+            params.append(after)
+
+        query = f'''
+            SELECT c.connection_id, c.line_number, c.from_stop, c.to_stop, c.weight,
+                   s1.active_status = 'yes' AND s2.active_status = 'yes'
+            FROM connections c
+            LEFT JOIN stops s1 ON s1.stop_id = c.from_stop
+            LEFT JOIN stops s2 ON s2.stop_id = c.to_stop
+            {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+            ORDER BY c.connection_id
+        '''
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [{
+                'id': row[0],
+                'line': row[1],
+                'from': row[2],
+                'to': row[3],
+                'weight': row[4],
+                'active': bool(row[5])
+            } for row in cursor.fetchall()]
 
     # Stop-related methods
+    def get_stop_details(self, stop_ids: Sequence[str]) -> Dict[str, Dict]:
+        """Stop row, serving lines and neighbouring connections for many stops, one query per 500 ids"""
+        details = {}
+        stop_ids = list(dict.fromkeys(stop_ids))
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(stop_ids), 500):
+                chunk = stop_ids[start:start + 500]
+                cursor.execute(f'''
+                    SELECT s.stop_id, s.stop_name, s.latitude, s.longitude, s.active_status,
+                           (SELECT json_group_array(line_number) FROM (
+                                SELECT DISTINCT line_number FROM stop_line_relations
+                                WHERE stop_id = s.stop_id ORDER BY line_number)),
+                           (SELECT json_group_array(json_object(
+                                'from', c.from_stop, 'to', c.to_stop, 'weight', c.weight,
+                                'line', c.line_number, 'neighbour_id', o.stop_id, 'neighbour_name', o.stop_name))
+                            FROM connections c
+                            LEFT JOIN stops o ON o.stop_id =
+                                CASE WHEN c.from_stop = s.stop_id THEN c.to_stop ELSE c.from_stop END
+                            WHERE c.from_stop = s.stop_id OR c.to_stop = s.stop_id)
+                    FROM stops s
+                    WHERE s.stop_id IN ({','.join('?' * len(chunk))})
+                ''', chunk)
+                for stop_id, stop_name, lat, lon, active_status, lines, connections in cursor.fetchall():
+                    details[stop_id] = {
+                        'info': {
+                            'stop_id': stop_id,
+                            'stop_name': stop_name,
+                            'latitude': lat,
+                            'longitude': lon,
+                            'active_status': active_status
+                        },
+                        'lines': json.loads(lines),
+                        'connections': json.loads(connections)
+                    }
+        return details
+
     def get_stops_with_names_and_ids(self) -> List[Tuple[str, str]]:
         """Get list of all stops with (stop_id, stop_name)"""
         with self._get_connection() as conn:
@@ -128,17 +566,15 @@ class TramDatabase:
 
     # Stop-Line relationship methods
     def get_stop_to_lines_mapping(self) -> Dict[str, List[str]]:
-        """Get mapping of stop_id to list of line_numbers"""
+        """Get mapping of stop_id to sorted list of distinct line_numbers"""
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT stop_id, line_number FROM stop_line_relations')
 
-            mapping = {}
+            mapping: Dict[str, Set[str]] = {}
             for stop_id, line_number in cursor.fetchall():
-                if stop_id not in mapping:
-                    mapping[stop_id] = []
-                mapping[stop_id].append(line_number)
-            return mapping
+                mapping.setdefault(stop_id, set()).add(line_number)
+            return {stop_id: sorted(lines) for stop_id, lines in mapping.items()}
 
     def get_lines_for_stop(self, stop_id: str) -> List[str]:
         """Get all lines that serve a specific stop"""
@@ -163,9 +599,32 @@ class TramDatabase:
             ''', (stop_id,))
             return cursor.fetchall()
 
+    def get_all_traffic_patterns(self) -> List[Tuple[str, str, int, float]]:
+        """Get all traffic patterns as (stop_id, day_of_week, hour, congestion_percent)"""
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            # CAST keeps the leading hour of both '08' and '08:00' style values
+            cursor.execute('''
+                SELECT stop_id, day_of_week, CAST(hour AS INTEGER), congestion_percent
+                FROM traffic_patterns
+            ''')
+            return cursor.fetchall()
+
     # Network graph creation
-    def create_network_graph(self) -> nx.Graph:
-        """Create a NetworkX graph with proper coordinate handling"""
+    def create_network_graph(self, use_snapshot: bool = True) -> 'nx.Graph':
+        """Create a NetworkX graph with proper coordinate handling
+
+        Built from the memory-mapped network snapshot when possible (rewritten
+        first if it is stale), falling back to querying the tables.
+        """
+        if use_snapshot:
+            try:
+                from network_snapshot import load_network_snapshot
+                return load_network_snapshot(self.db_file).to_graph()
+            except (OSError, ValueError, sqlite3.Error) as e:
+                print(f"Network snapshot unavailable, reading the tables instead: {e}")
+
+        import networkx as nx
         G = nx.Graph()
 
         with self._get_connection() as conn:
@@ -1,88 +1,173 @@
+import json
 import sqlite3
-from typing import List, Tuple, Optional
-import networkx as nx
-from shortest_path_1 import TramNetwork
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional
+from db_handler import CHANGE_LOG_RETENTION, TramDatabase
+from event_bus import EventBus, event_bus
+
+if TYPE_CHECKING:
+    from shortest_path_1 import TramNetwork
 import datetime
 
 class TramDatabaseOperations:
-    def __init__(self, db_file='tram_data2.db'):
+    def __init__(self, db_file='tram_data2.db', events: Optional[EventBus] = event_bus):
         self.db_file = db_file
+        self.db = TramDatabase(db_file)
+        self.events = events
+        self._routing = (None, None)  # (network revision, TramNetwork)
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_file)
+        self.db.ensure_schema()
+        return self.db._get_connection()
+
+    @contextmanager
+    def _network_write(self):
+        """Cursor for one network mutation logged by _record_change, committed on success.
+
+        The guard row keeps the network table triggers from bumping the
+        revision per row, so each logged change is exactly one revision.
+        """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO revision_guards (name) VALUES ('network')")
+            yield cursor
+            cursor.execute("DELETE FROM revision_guards WHERE name = 'network'")
+            conn.commit()
+
+    def _bump_revision(self, cursor, name: str = 'network') -> int:
+        """Advance a revision counter inside the caller's transaction so caches see the change"""
+        cursor.execute('UPDATE data_revisions SET revision = revision + 1 WHERE name = ?', (name,))
+        cursor.execute('SELECT revision FROM data_revisions WHERE name = ?', (name,))
+        return cursor.fetchone()[0]
+
+    def _record_change(self, cursor, entity: str, action: str, key: str, data: Optional[Dict] = None) -> Dict:
+        """Bump the network revision and log the mutation under it for delta-syncing clients"""
+        revision = self._bump_revision(cursor)
+        cursor.execute('''
+            INSERT INTO network_changes (revision, entity, action, entity_key, payload)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (revision, entity, action, key, json.dumps(data) if data is not None else None))
+        cursor.execute('DELETE FROM network_changes WHERE revision <= ?', (revision - CHANGE_LOG_RETENTION,))
+        return {'revision': revision, 'entity': entity, 'action': action, 'key': key, 'data': data}
+
+    def _publish(self, change: Optional[Dict]):
+        """Push a committed change to live listeners (same shape as /api/network/changes entries)"""
+        if change is not None and self.events is not None:
+            self.events.publish('network', change)
+
+    def _stop_snapshot(self, cursor, stop_id: str) -> Optional[Dict]:
+        """Stop as the frontend shows it: table row fields, graph position and its connections"""
+        cursor.execute('''
+            SELECT stop_id, stop_name, latitude, longitude, active_status
+            FROM stops WHERE stop_id = ?
+        ''', (stop_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+        stop_id, stop_name, lat, lon, active_status = row
+
+        cursor.execute('SELECT DISTINCT line_number FROM stop_line_relations WHERE stop_id = ?', (stop_id,))
+        lines = [line for line, in cursor.fetchall()]
+        cursor.execute('''
+            SELECT DISTINCT from_stop, to_stop, weight FROM connections
+            WHERE from_stop = ? OR to_stop = ?
+        ''', (stop_id, stop_id))
+        connections = [{'from': from_stop, 'to': to_stop, 'weight': weight}
+                       for from_stop, to_stop, weight in cursor.fetchall()]
+
+        return {
+            'id': stop_id,
+            'name': stop_name,
+            'active_status': active_status,
+            'lines': lines,
+            'x': float(lon) if lat and lon else None,  # same (lon, lat) convention as the graph endpoint
+            'y': float(lat) if lat and lon else None,
+            'connections': connections
+        }
 
     # Stop Operations
     def add_stop(self, stop_id: str, stop_name: str, latitude: Optional[float] = None,
                  longitude: Optional[float] = None, active: bool = True):
         """Add a new stop to the database"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        with self._network_write() as cursor:
             cursor.execute('''
                 INSERT OR REPLACE INTO stops (stop_id, stop_name, latitude, longitude, active_status)
                 VALUES (?, ?, ?, ?, ?)
             ''', (stop_id, stop_name, latitude, longitude, 'yes' if active else 'no'))
-            conn.commit()
+            change = self._record_change(cursor, 'stop', 'upsert', stop_id, self._stop_snapshot(cursor, stop_id))
+        self._publish(change)
 
     def delete_stop(self, stop_id: str):
         """Remove a stop from the database"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        with self._network_write() as cursor:
             # First delete all connections involving this stop
             cursor.execute('DELETE FROM connections WHERE from_stop = ? OR to_stop = ?', (stop_id, stop_id))
             # Then delete the stop
             cursor.execute('DELETE FROM stops WHERE stop_id = ?', (stop_id,))
-            conn.commit()
+            change = self._record_change(cursor, 'stop', 'delete', stop_id) if cursor.rowcount else None
+        self._publish(change)
 
     # Connection Operations
     def add_connection(self, line_number: str, from_stop: str, to_stop: str, weight: int, active_status: str = 'yes'):
         """Add a new connection between stops"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        with self._network_write() as cursor:
             cursor.execute('''
                 INSERT OR REPLACE INTO connections 
                 (line_number, from_stop, to_stop, weight)
                 VALUES (?, ?, ?, ?)
             ''', (line_number, from_stop, to_stop, weight))
-            conn.commit()
+            change = self._record_change(cursor, 'connection', 'upsert', f"{from_stop}|{to_stop}",
+                                         {'from': from_stop, 'to': to_stop, 'weight': weight, 'line': line_number})
+        self._publish(change)
 
     def delete_connection(self, from_stop: str, to_stop: str):
         """Remove a connection between stops"""
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
+        with self._network_write() as cursor:
             cursor.execute('''
                 DELETE FROM connections 
                 WHERE (from_stop = ? AND to_stop = ?)
                 OR (from_stop = ? AND to_stop = ?)
             ''', (from_stop, to_stop, to_stop, from_stop))
-            conn.commit()
+            change = None
+            if cursor.rowcount:
+                change = self._record_change(cursor, 'connection', 'delete', f"{from_stop}|{to_stop}",
+                                             {'from': from_stop, 'to': to_stop})
+        self._publish(change)
 
     def set_stop_active_status(self, stop_id: str, active: bool):
         """Activate or deactivate a stop"""
         status = 'yes' if active else 'no'
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            try:
+        try:
+            with self._network_write() as cursor:
                 # Update the stop's active status
                 cursor.execute('''
                     UPDATE stops 
                     SET active_status = ?
                     WHERE stop_id = ?
                 ''', (status, stop_id))
-                conn.commit()
-                return True
-            except sqlite3.Error as e:
-                print(f"Database error when updating stop status: {e}")
-                return False
+                change = None
+                if cursor.rowcount:
+                    change = self._record_change(cursor, 'stop', 'upsert', stop_id, self._stop_snapshot(cursor, stop_id))
+        except sqlite3.Error as e:
+            print(f"Database error when updating stop status: {e}")
+            return False
+        self._publish(change)
+        return True
+
+    def routing_network(self) -> 'TramNetwork':
+        """Resident routing graph, rebuilt only when the network revision moves"""
+        from shortest_path_1 import TramNetwork  # networkx is only loaded once routing is needed
+        revision = self.db.get_revision('network')
+        cached_revision, network = self._routing
+        if network is None or cached_revision != revision:
+            network = TramNetwork(self.db_file)
+            self._routing = (revision, network)
+        return network
 
     def find_shortest_path(self, start_stop: str, end_stop: str) -> Tuple[List[str], str]:
         """Find the shortest path between two active stops and return path with names"""
-        with self._get_connection() as conn:
-            # Create network instance
-            network = TramNetwork(self.db_file)
-
-            # Find path with names
-            path, duration = network.find_shortest_path(start_stop, end_stop, return_names=True)
-            return path, duration
+        path, duration = self.routing_network().find_shortest_path(start_stop, end_stop, return_names=True)
+        return path, duration
 
     def is_stop_active(self, stop_id: str) -> bool:
         """Check if a stop is active"""
@@ -94,6 +179,7 @@ class TramDatabaseOperations:
 
     def create_network_graph(self):
         """Create a network graph from the database"""
+        import networkx as nx
         with self._get_connection() as conn:
             cursor = conn.cursor()
 
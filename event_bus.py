@@ -0,0 +1,130 @@
+import itertools
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from typing import Dict, Iterator, Optional
+
+
+class Subscription:
+    """One listener's bounded event queue; it is dropped by the bus when it overflows"""
+
+    def __init__(self, maxsize: int):
+        self.queue: queue.Queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """Next event, or None if nothing arrived within the timeout"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """In-process publish/subscribe hub for pushing change events to connected clients.
+
+    Publishing never blocks: a subscriber that stops reading is marked as
+    overflowed and removed instead of holding up the writer.
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.maxsize)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event_type: str, data=None) -> Dict:
+        """Deliver an event to every subscriber and return it"""
+        with self._lock:
+            event = {'id': next(self._ids), 'type': event_type, 'data': data}
+            for subscription in list(self._subscribers):
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    subscription.overflowed = True
+                    self._subscribers.discard(subscription)
+        return event
+
+    def stream(self, subscription: Subscription, keepalive: float = 15.0) -> Iterator[str]:
+        """Server-sent events for a subscription, with comment lines as keepalives"""
+        try:
+            while not subscription.overflowed:
+                event = subscription.get(timeout=keepalive)
+                if event is None:
+                    yield ": keepalive\n\n"
+                else:
+                    yield format_sse(event)
+            # Tell the client it missed events so it can resynchronise
+            yield format_sse({'id': None, 'type': 'reset', 'data': None})
+        finally:
+            self.unsubscribe(subscription)
+
+
+def format_sse(event: Dict) -> str:
+    lines = []
+    if event.get('id') is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'], separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class ChangeLogRelay:
+    """Publish network changes committed by any process, read back from the network_changes log.
+
+    With several server workers a change is committed in one process only;
+    each worker runs a relay so its own SSE clients still see it.
+    """
+
+    def __init__(self, db, bus: EventBus, interval: float = 0.5):
+        self.db = db
+        self.bus = bus
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='change-log-relay', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        revision = self.db.get_revision('network')
+        while not self._stopped.wait(self.interval):
+            try:
+                if not len(self.bus):
+                    # Nobody listening: just keep up with the revision
+                    revision = self.db.get_revision('network')
+                    continue
+                current, changes = self.db.get_network_changes(revision)
+            except sqlite3.Error as e:
+                logging.warning(f"Change log relay could not read changes: {e}")
+                continue
+
+            if changes is None:
+                self.bus.publish('reset')
+            else:
+                for change in changes:
+                    self.bus.publish('network', change)
+            revision = current
+
+
+# Shared bus for the web app and the database operations it calls
+event_bus = EventBus()
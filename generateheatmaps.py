@@ -1,36 +1,118 @@
-import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
-import json 
-
-# Funkcja do ładowania danych z pliku JSON
-def load_data_from_json(file_path):
-    with open(file_path, 'r', encoding='utf-8') as file:
-        return json.load(file)
-
-file_path = 'traffic_data.json'
-data = load_data_from_json(file_path)
-
-def get_traffic_data_for_location(location_name, data):
-    for location_data in data:
-        if location_data['location'].lower() == location_name.lower():
-            return location_data['traffic_data']
-    return None
-
-# Użytkownik wpisuje nazwę lokalizacji
-# location_name = input("Wpisz nazwę przystanku: ")
-# traffic_data = get_traffic_data_for_location(location_name, data)
-#
-# if traffic_data is not None:
-#     days = [day[0] for day in traffic_data]  # Lista dni
-#     hours = [f"{hour:02d}:00" for hour in range(24)]  # Lista godzin
-#     traffic_matrix = np.array([[int(hour.split(': ')[1].strip('%.')) for hour in day[1]] for day in traffic_data])
-#
-#     plt.figure(figsize=(12, 7))
-#     sns.heatmap(traffic_matrix, annot=True, fmt="d", cmap="coolwarm", xticklabels=hours, yticklabels=days)
-#     plt.title(f'Traffic Intensity Heatmap for {location_name}')
-#     plt.xlabel('Hour of the Day')
-#     plt.ylabel('Day of the Week')
-#     plt.show()
-# else:
-#     print("Nie znaleziono danych dla wybranej lokalizacji.")
+"""Render traffic heatmaps for every stop (or a filtered set) in parallel.
+
+    python generateheatmaps.py [--out heatmap_cache] [--format png svg] [--line 8 --line 33]
+                                    [--stops 10001 10002] [--workers 4] [--force]
+
+The output directory is a HeatmapCache (the one the GUI reads from by
+default), so images are named by stop, traffic revision and style version,
+and stops already rendered for the current traffic data are skipped unless
+--force. An index.json lists the images of each stop.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from db_handler import TramDatabase
+from heatmap_renderer import CACHE_DIR, STYLE_VERSION, HeatmapCache
+from traffic_store import get_traffic_store
+
+INDEX_FILE = 'index.json'
+
+
+def select_stops(db: TramDatabase, stop_ids: Sequence[str], available: Sequence[str],
+                 lines: Optional[Sequence[str]] = None) -> List[str]:
+    """Stops with traffic data, narrowed to the requested ids and/or lines"""
+    selected = list(stop_ids) if stop_ids else list(available)
+    if lines:
+        wanted = set(lines)
+        served = db.get_stop_to_lines_mapping()
+        selected = [stop_id for stop_id in selected if wanted.intersection(served.get(stop_id, ()))]
+    with_data = set(available)
+    missing = [stop_id for stop_id in selected if stop_id not in with_data]
+    if missing:
+        print(f"No traffic data for {len(missing)} requested stop(s): {', '.join(missing[:10])}")
+    return [stop_id for stop_id in selected if stop_id in with_data]
+
+
+def load_index(out_dir: str) -> Dict:
+    try:
+        with open(os.path.join(out_dir, INDEX_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def generate_heatmaps(db_file: str = 'tram_data2.db', out_dir: str = CACHE_DIR, formats: Sequence[str] = ('png',),
+                      stop_ids: Sequence[str] = (), lines: Sequence[str] = (), workers: Optional[int] = None,
+                      force: bool = False) -> Dict:
+    """Render the selected stops and write the index; returns the index"""
+    db = TramDatabase(db_file)
+    store = get_traffic_store(db_file)
+    cache = HeatmapCache(db_file, out_dir)
+    names = dict(db.get_stops_with_names_and_ids())
+    stops = select_stops(db, stop_ids, store.stop_ids, lines)
+    os.makedirs(out_dir, exist_ok=True)
+
+    # Entries from a previous run are still valid for the same traffic data and drawing
+    previous = load_index(out_dir)
+    entries = {}
+    if previous.get('traffic_revision') == store.revision and previous.get('style_version') == STYLE_VERSION:
+        entries = {entry['stop_id']: entry for entry in previous.get('stops', [])}
+    todo = [stop_id for stop_id in stops if force or not cache.is_rendered(stop_id, formats)]
+    for stop_id in set(stops).difference(todo):
+        seconds = entries.get(stop_id, {}).get('seconds')
+        entries[stop_id] = _entry(stop_id, names, cache.paths_for(stop_id, formats), seconds)
+    print(f"Rendering {len(todo)} of {len(stops)} stop(s) as {', '.join(formats)} into {out_dir}/"
+          f" ({len(stops) - len(todo)} up to date)")
+
+    start = time.perf_counter()
+    workers = max(1, min(workers or os.cpu_count() or 1, len(todo)))
+    for done, (stop_id, paths, seconds) in enumerate(cache.prerender(todo, workers, formats, force), 1):
+        if paths is None:
+            print(f"[{done}/{len(todo)}] {stop_id} failed")
+            continue
+        entries[stop_id] = _entry(stop_id, names, paths, round(seconds, 3))
+        print(f"[{done}/{len(todo)}] {stop_id} {names.get(stop_id, '')}: {seconds:.2f} s")
+    elapsed = time.perf_counter() - start
+
+    index = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'traffic_revision': store.revision,
+        'style_version': STYLE_VERSION,
+        'stops': sorted(entries.values(), key=lambda entry: entry['stop_id']),
+    }
+    temp_path = os.path.join(out_dir, f"{INDEX_FILE}.tmp")
+    with open(temp_path, 'w', encoding='utf-8') as file:
+        json.dump(index, file, ensure_ascii=False, indent=2)
+    os.replace(temp_path, os.path.join(out_dir, INDEX_FILE))
+
+    if todo:
+        print(f"Rendered {len(todo)} stop(s) in {elapsed:.1f} s with {workers} worker(s) "
+              f"({elapsed / len(todo):.2f} s per stop wall-clock)")
+    return index
+
+
+def _entry(stop_id: str, names: Dict[str, str], paths: Dict[str, str], seconds: Optional[float]) -> Dict:
+    return {'stop_id': stop_id, 'name': names.get(stop_id, stop_id),
+            'files': [os.path.basename(path) for path in paths.values()], 'seconds': seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', default='tram_data2.db')
+    parser.add_argument('--out', default=CACHE_DIR, help="output directory")
+    parser.add_argument('--format', nargs='+', default=['png'], choices=['png', 'svg'])
+    parser.add_argument('--stops', nargs='*', default=[], help="stop ids (default: every stop with traffic data)")
+    parser.add_argument('--line', action='append', default=[], help="only stops served by this line (repeatable)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="re-render stops that are up to date")
+    args = parser.parse_args()
+
+    generate_heatmaps(args.db, args.out, args.format, args.stops, args.line, args.workers, args.force)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from typing import Dict, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+
+Position = Tuple[float, float]
+
+# Bump when the placement changes so stored layouts are recomputed
+LAYOUT_VERSION = 1
+
+
+def layout_path_for(db_file: str) -> str:
+    return os.path.splitext(db_file)[0] + '.layout.json'
+
+
+def full_layout(graph, seed: int = 42) -> Dict[Hashable, Position]:
+    """Force-directed layout of the whole graph; O(n^2) per iteration, so only used with nothing to start from"""
+    import networkx as nx
+
+    pos = nx.spring_layout(graph, k=0.7, iterations=50, seed=seed)
+    return {node: (float(x), float(y)) for node, (x, y) in pos.items()}
+
+
+def place_new_nodes(graph, pos: Dict[Hashable, Position], nodes: Iterable[Hashable], iterations: int = 30,
+                    seed: int = 42) -> Dict[Hashable, Position]:
+    """Positions for the given nodes, keeping every node already in pos where it is.
+
+    Each new node starts at the mean of its placed neighbours (sweeping
+    outwards, so chains of new stops follow), then only the new nodes and
+    their neighbours get a short force-directed pass with the neighbours fixed.
+    """
+    import networkx as nx
+
+    rng = np.random.default_rng(seed)
+    undirected = graph.to_undirected(as_view=True)
+    known = {node: np.asarray(p, dtype=float) for node, p in pos.items()}
+    coords = np.array(list(known.values())).reshape(-1, 2)
+    low, high = coords.min(axis=0), coords.max(axis=0)
+    extent = float((high - low).max()) or 1.0
+    lengths = [np.linalg.norm(known[u] - known[v]) for u, v in undirected.edges() if u in known and v in known]
+    spacing = float(np.median(lengths)) if lengths else extent / np.sqrt(len(known))
+    spacing = spacing or extent / np.sqrt(len(known))
+
+    new = [node for node in nodes if node not in known]
+    pending = new
+    while pending:
+        waiting = []
+        for node in pending:
+            placed = [known[other] for other in undirected[node] if other in known]
+            if placed:
+                known[node] = np.mean(placed, axis=0) + rng.normal(scale=spacing / 2, size=2)
+            else:
+                waiting.append(node)
+        if len(waiting) == len(pending):
+            # Not connected to anything placed: start its component beside the layout
+            known[waiting[0]] = np.array([high[0] + spacing, rng.uniform(low[1], high[1])])
+            waiting = waiting[1:]
+        pending = waiting
+
+    if new:
+        local = set(new)
+        for node in new:
+            local.update(undirected[node])
+        # Components with nothing fixed would just drift, so they keep their seeded places
+        anchored = set()
+        for component in nx.connected_components(undirected.subgraph(local)):
+            if any(node in pos for node in component):
+                anchored.update(component)
+        if anchored:
+            # Relax in a unit-sized frame; spring_layout's step size assumes one
+            seeds = {node: (known[node] - low) / extent for node in anchored}
+            relaxed = nx.spring_layout(undirected.subgraph(anchored), pos=seeds,
+                                       fixed=[node for node in anchored if node in pos], k=spacing / extent,
+                                       iterations=iterations, weight=None, seed=seed)
+            for node in anchored.difference(pos):
+                known[node] = np.asarray(relaxed[node]) * extent + low
+
+    return {node: (float(x), float(y)) for node, (x, y) in known.items()}
+
+
+class LayoutCache:
+    """Node positions persisted as JSON, so a layout is computed once and not on every render.
+
+    get() returns stored positions when the graph's nodes are unchanged,
+    places only newly added nodes (see place_new_nodes) and drops removed
+    ones, and writes the file back only when something changed. Node ids are
+    stored as JSON keys, so they must be strings.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.revision: Optional[int] = None
+        self._positions: Optional[Dict[str, Position]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Position]:
+        if self._positions is None:
+            self._positions = {}
+            try:
+                with open(self.path, 'r', encoding='utf-8') as file:
+                    stored = json.load(file)
+                if stored.get('version') == LAYOUT_VERSION:
+                    self.revision = stored.get('revision')
+                    self._positions = {node: tuple(p) for node, p in stored['positions'].items()}
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                if os.path.exists(self.path):
+                    print(f"Ignoring unreadable layout {self.path}: {e}")
+        return self._positions
+
+    def get(self, graph, revision: Optional[int] = None,
+            fixed: Optional[Dict[str, Position]] = None) -> Dict[str, Position]:
+        """Position of every node in graph; fixed positions (e.g. coordinates) take precedence"""
+        with self._lock:
+            stored = self._load()
+            pos = {node: stored[node] for node in graph if node in stored}
+            if fixed:
+                pos.update((node, tuple(p)) for node, p in fixed.items() if node in graph)
+            missing = [node for node in graph if node not in pos]
+
+            if not pos:
+                pos = full_layout(graph)
+            elif missing:
+                pos = place_new_nodes(graph, pos, missing)
+
+            if pos != stored or revision != self.revision:
+                self._save(pos, revision)
+            return pos
+
+    def _save(self, pos: Dict[str, Position], revision: Optional[int]):
+        self._positions, self.revision = dict(pos), revision
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({'version': LAYOUT_VERSION, 'revision': revision,
+                           'positions': {node: list(p) for node, p in pos.items()}}, file)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save layout {self.path}: {e}")
@@ -0,0 +1,208 @@
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from tkinter import ttk
+from typing import Any, Callable, Dict, Optional
+
+
+class TaskCancelled(Exception):
+    """Raised inside a task's work function once the task has been cancelled"""
+
+
+class Task:
+    """Handle for one background job: cancellation flag and progress reporting.
+
+    The work function receives its Task and should call check() or
+    progress() between steps; both raise TaskCancelled after cancel().
+    """
+
+    def __init__(self, tasks: 'BackgroundTasks', name: str):
+        self.name = name
+        self._tasks = tasks
+        self._cancelled = threading.Event()
+        self.future = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def check(self):
+        if self.cancelled:
+            raise TaskCancelled(self.name)
+
+    def progress(self, message: Optional[str] = None, fraction: Optional[float] = None):
+        """Report progress to the UI (fraction in 0..1, or None for indeterminate)"""
+        self.check()
+        self._tasks._post(self, 'progress', (message, fraction))
+
+
+class ProgressIndicator(ttk.Frame):
+    """Overlay with a message, a progress bar and a Cancel button, shown while a task runs"""
+
+    def __init__(self, parent, text: str = "Working...", on_cancel: Optional[Callable[[], None]] = None,
+                 **place_options):
+        super().__init__(parent, padding=10)
+        self.place_options = place_options or {'relx': 0.5, 'rely': 0.5, 'anchor': 'center'}
+        self.text = text
+        self.on_cancel = on_cancel
+        self.label = ttk.Label(self, text=text)
+        self.label.pack(pady=(0, 5))
+        self.bar = ttk.Progressbar(self, length=220)
+        self.bar.pack()
+        self.cancel_button = ttk.Button(self, text="Cancel")
+        self.cancel_button.pack(pady=(5, 0))
+        self._task: Optional[Task] = None
+
+    def start(self, task: Task):
+        self._task = task
+        self.cancel_button.config(command=self._cancel, state=tk.NORMAL)
+        self.label.config(text=self.text)
+        self.bar.config(mode='indeterminate', value=0)
+        self.bar.start(15)
+        self.place(**self.place_options)
+        self.lift()
+
+    def update_progress(self, message: Optional[str], fraction: Optional[float]):
+        if message:
+            self.label.config(text=message)
+        if fraction is not None:
+            self.bar.stop()
+            self.bar.config(mode='determinate', value=max(0.0, min(fraction, 1.0)) * 100)
+
+    def stop(self, task: Task):
+        # A newer task may already have taken over the indicator
+        if task is self._task:
+            self._task = None
+            self.bar.stop()
+            self.place_forget()
+
+    def _cancel(self):
+        if self._task is not None:
+            task = self._task
+            task.cancel()
+            self.stop(task)
+            if self.on_cancel is not None:
+                self.on_cancel()
+
+
+class BackgroundTasks:
+    """Thread pool for slow work started from Tk callbacks.
+
+    Work runs on worker threads; results, errors and progress are queued and
+    delivered to the callbacks on the Tk thread by polling with after(), so
+    callbacks may touch widgets freely. Submitting with a key cancels the
+    previous task with that key, so only the latest result is delivered.
+    """
+
+    def __init__(self, root: tk.Misc, max_workers: int = 2, poll_ms: int = 50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gui-task')
+        self._events: queue.Queue = queue.Queue()
+        self._by_key: Dict[str, Task] = {}
+        self._running: Dict[Task, Dict[str, Any]] = {}
+        self._polling = False
+
+    def submit(self, work: Callable[..., Any], *args, name: Optional[str] = None,
+               on_done: Optional[Callable[[Any], None]] = None,
+               on_error: Optional[Callable[[Exception], None]] = None,
+               on_progress: Optional[Callable[[Optional[str], Optional[float]], None]] = None,
+               key: Optional[str] = None, owner: Optional[tk.Misc] = None,
+               indicator: Optional[ProgressIndicator] = None) -> Task:
+        """Run work(task, *args) in the background.
+
+        Callbacks are skipped once the task is cancelled or the owner widget
+        has been destroyed.
+        """
+        if key is not None:
+            self.cancel(key)
+        task = Task(self, name or getattr(work, '__name__', 'task'))
+        self._running[task] = {'on_done': on_done, 'on_error': on_error, 'on_progress': on_progress,
+                               'owner': owner, 'indicator': indicator, 'key': key}
+        if key is not None:
+            self._by_key[key] = task
+        if indicator is not None:
+            indicator.start(task)
+
+        task.future = self._executor.submit(self._run, task, work, args)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+        return task
+
+    def cancel(self, key: str):
+        task = self._by_key.pop(key, None)
+        if task is not None:
+            task.cancel()
+
+    def shutdown(self):
+        for task in list(self._running):
+            task.cancel()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _post(self, task: Task, kind: str, payload: Any):
+        self._events.put((task, kind, payload))
+
+    def _run(self, task: Task, work: Callable[..., Any], args: tuple):
+        try:
+            task.check()
+            self._post(task, 'done', work(task, *args))
+        except TaskCancelled:
+            self._post(task, 'cancelled', None)
+        except Exception as e:
+            self._post(task, 'error', e)
+
+    def _poll(self):
+        while True:
+            try:
+                task, kind, payload = self._events.get_nowait()
+            except queue.Empty:
+                break
+            self._dispatch(task, kind, payload)
+
+        # A task cancelled before it started never reports back
+        for task in [task for task in self._running if task.future.cancelled()]:
+            self._finish(task)
+
+        if self._running:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def _dispatch(self, task: Task, kind: str, payload: Any):
+        callbacks = self._running.get(task)
+        if callbacks is None:
+            return
+        if kind == 'progress':
+            if not task.cancelled:
+                if callbacks['indicator'] is not None:
+                    callbacks['indicator'].update_progress(*payload)
+                if callbacks['on_progress'] is not None:
+                    callbacks['on_progress'](*payload)
+            return
+
+        self._finish(task)
+        owner = callbacks['owner']
+        if task.cancelled or kind == 'cancelled' or (owner is not None and not owner.winfo_exists()):
+            return
+        if kind == 'done':
+            if callbacks['on_done'] is not None:
+                callbacks['on_done'](payload)
+        elif callbacks['on_error'] is not None:
+            callbacks['on_error'](payload)
+        else:
+            print(f"{task.name} failed: {payload}")
+
+    def _finish(self, task: Task):
+        callbacks = self._running.pop(task)
+        if callbacks['key'] is not None and self._by_key.get(callbacks['key']) is task:
+            del self._by_key[callbacks['key']]
+        indicator = callbacks['indicator']
+        if indicator is not None and indicator.winfo_exists():
+            indicator.stop(task)
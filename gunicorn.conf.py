@@ -0,0 +1,31 @@
+"""Production serving: gunicorn -c gunicorn.conf.py
+
+The app is imported and warmed up once in the master (routing graph, graph
+payload, search/spatial indexes, traffic cube); workers are forked from it
+and share that memory copy-on-write. Each worker then runs a change-log
+relay so server-sent events reach clients connected to any worker.
+"""
+import multiprocessing
+import os
+
+wsgi_app = 'app:app'
+bind = os.environ.get('TRAMS_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('TRAMS_WORKERS', multiprocessing.cpu_count()))
+# Threaded workers: /api/events keeps a thread per connected dashboard
+worker_class = 'gthread'
+threads = int(os.environ.get('TRAMS_THREADS', 16))
+# SSE responses stay open; keepalive comments arrive every 15s
+timeout = 60
+keepalive = 5
+preload_app = True
+accesslog = '-'
+
+
+def when_ready(server):
+    import app
+    app.warm_up()
+
+
+def post_fork(server, worker):
+    import app
+    app.start_change_relay()
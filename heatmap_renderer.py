@@ -0,0 +1,175 @@
+import glob
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import numpy as np
+
+from traffic_store import DAYS, get_traffic_store
+
+CACHE_DIR = 'heatmap_cache'
+FIGSIZE = (15, 10)
+DPI = 120
+# Bump when the drawing changes so cached images are not reused
+STYLE_VERSION = 1
+
+_local = threading.local()
+
+
+def heatmap_matrix(stop_traffic: Optional[np.ndarray]) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(hours with data, days x those hours matrix scaled to 0-1) from a 7 x 24 slice of the traffic cube"""
+    if stop_traffic is None:
+        return None
+    # Keep only hours that have data, missing cells default to 0
+    hours = np.flatnonzero(~np.isnan(stop_traffic).all(axis=0))
+    if not hours.size:
+        return None
+    return hours, np.nan_to_num(stop_traffic[:, hours]) / 100
+
+
+def draw_heatmap(fig, stop_id: str, hours: np.ndarray, matrix: np.ndarray):
+    """Draw the heatmap onto fig, clearing whatever it held, so one figure can be reused"""
+    import seaborn as sns
+
+    fig.clear()
+    ax = sns.heatmap(
+        matrix,
+        ax=fig.add_subplot(111),
+        annot=True,
+        fmt=".0%",  # Format as percentages (e.g., 75%)
+        cmap="coolwarm",
+        vmin=0,
+        vmax=1,  # Ensure color scale is 0-100%
+        xticklabels=[f"{int(h):02d}:00" for h in hours],
+        yticklabels=DAYS
+    )
+    ax.set_title(f'Traffic Intensity at Stop {stop_id} (%)', pad=20)
+    ax.set_xlabel('Hour of Day', labelpad=15)
+    ax.set_ylabel('Day of Week', labelpad=15)
+    ax.tick_params(axis='y', rotation=0)  # Keep day labels horizontal
+    fig.tight_layout()
+
+
+def reusable_figure():
+    """Per-thread Agg figure; pyplot is not used, so this is safe off the Tk thread and in worker processes"""
+    fig = getattr(_local, 'figure', None)
+    if fig is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=FIGSIZE)
+        FigureCanvasAgg(fig)
+        _local.figure = fig
+    return fig
+
+
+def save_figure(fig, path: str, fmt: Optional[str] = None):
+    """Write atomically, so concurrent renderers and readers never see a partial file"""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.') or 'png'
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fig.savefig(temp_path, format=fmt, dpi=DPI, bbox_inches='tight')
+    os.replace(temp_path, path)
+
+
+class HeatmapCache:
+    """Rendered stop heatmaps on disk, keyed by stop id and traffic revision.
+
+    A stop is rendered once per revision of the traffic_patterns table;
+    later views just return the file. Images of older revisions are removed
+    when a stop is re-rendered.
+    """
+
+    def __init__(self, db_file: str = 'tram_data2.db', cache_dir: str = CACHE_DIR):
+        self.db_file = db_file
+        self.cache_dir = cache_dir
+
+    def _prefix(self, stop_id: str) -> str:
+        return os.path.join(self.cache_dir, quote(stop_id, safe=''))
+
+    def path_for(self, stop_id: str, revision: int, fmt: str = 'png') -> str:
+        return f"{self._prefix(stop_id)}_r{revision}_v{STYLE_VERSION}.{fmt}"
+
+    def get(self, stop_id: str, fmt: str = 'png') -> Optional[str]:
+        """Path of the stop's heatmap for the current traffic data, or None if it has no data"""
+        return self.render(stop_id, (fmt,)).get(fmt)
+
+    def paths_for(self, stop_id: str, formats: Sequence[str] = ('png',)) -> Dict[str, str]:
+        """{format: path} for the current traffic data, whether rendered yet or not"""
+        revision = get_traffic_store(self.db_file).revision
+        return {fmt: self.path_for(stop_id, revision, fmt) for fmt in formats}
+
+    def is_rendered(self, stop_id: str, formats: Sequence[str] = ('png',)) -> bool:
+        return all(os.path.exists(path) for path in self.paths_for(stop_id, formats).values())
+
+    def render(self, stop_id: str, formats: Sequence[str] = ('png',), force: bool = False) -> Dict[str, str]:
+        """{format: path} of the stop's heatmaps for the current traffic data; empty if it has no data.
+
+        Missing formats (every format with force) are saved from one drawing.
+        """
+        store = get_traffic_store(self.db_file)
+        paths = self.paths_for(stop_id, formats)
+        todo = [fmt for fmt, path in paths.items() if force or not os.path.exists(path)]
+        if not todo:
+            return paths
+
+        data = heatmap_matrix(store.for_stop(stop_id))
+        if data is None:
+            return {}
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fig = reusable_figure()
+        draw_heatmap(fig, stop_id, *data)
+        for fmt in todo:
+            save_figure(fig, paths[fmt], fmt)
+            self._prune(stop_id, keep=paths[fmt])
+        return paths
+
+    def _prune(self, stop_id: str, keep: str):
+        for stale in glob.glob(f"{glob.escape(self._prefix(stop_id))}_r*_v*.*"):
+            if stale != keep and not stale.endswith('.tmp') and os.path.splitext(stale)[1] == os.path.splitext(keep)[1]:
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+
+    def prerender(self, stop_ids: Optional[Iterable[str]] = None, workers: Optional[int] = None,
+                  formats: Sequence[str] = ('png',), force: bool = False
+                  ) -> Iterator[Tuple[str, Optional[Dict[str, str]], float]]:
+        """Fill the cache for many stops (default: all with traffic data) in worker processes.
+
+        Yields (stop_id, {format: path} or None if rendering failed, seconds)
+        as each stop finishes.
+        """
+        stop_ids = list(stop_ids) if stop_ids is not None else list(get_traffic_store(self.db_file).stop_ids)
+        if not stop_ids:
+            return
+        workers = max(1, min(workers or os.cpu_count() or 1, len(stop_ids)))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self.db_file,)) as pool:
+            futures = {pool.submit(_render_cached, self.db_file, self.cache_dir, stop_id, tuple(formats), force): stop_id
+                       for stop_id in stop_ids}
+            for future in as_completed(futures):
+                stop_id = futures[future]
+                try:
+                    paths, seconds = future.result()
+                except Exception as e:
+                    print(f"Rendering the heatmap of {stop_id} failed: {e}")
+                    yield stop_id, None, 0.0
+                else:
+                    yield stop_id, paths, seconds
+
+
+def _init_worker(db_file: str):
+    import matplotlib
+    matplotlib.use('Agg')
+    # Load the traffic cube and the figure once per process, not per stop
+    get_traffic_store(db_file)
+    reusable_figure()
+
+
+def _render_cached(db_file: str, cache_dir: str, stop_id: str, formats: Sequence[str],
+                   force: bool) -> Tuple[Dict[str, str], float]:
+    start = time.perf_counter()
+    paths = HeatmapCache(db_file, cache_dir).render(stop_id, formats, force)
+    return paths, time.perf_counter() - start
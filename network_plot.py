@@ -0,0 +1,314 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.colors import to_rgba
+from matplotlib.lines import Line2D
+from matplotlib.path import Path
+from matplotlib.transforms import Bbox, IdentityTransform
+
+from spatial_index import GridIndex
+
+NODE_COLOR = '#1a237e'
+EDGE_COLOR = '#5D6D7E'
+TERMINAL_SIZE, REGULAR_SIZE, INACTIVE_SIZE = 200, 150, 100
+TERMINAL_ALPHA, REGULAR_ALPHA, INACTIVE_ALPHA = 1.0, 0.8, 0.5
+# Pointer distance, in pixels, within which a stop counts as hovered/clicked
+HIT_RADIUS_PX = 8
+# Arrowhead of a directed connection, in points: tip back from the stop centre, length, half width
+ARROW_TIP, ARROW_LENGTH, ARROW_HALF_WIDTH = 7.0, 10.0, 4.0
+
+
+class NetworkPlot:
+    """Tram network drawn with a fixed set of matplotlib artists that are updated in place.
+
+    Every stop has a slot in a circle collection (active stops) and a square
+    collection (inactive stops); the one that does not apply is transparent.
+    Toggling a stop only rewrites its two colour rows and its label's
+    visibility, and connections are one LineCollection whose segments are
+    replaced when the set of active connections changes. For a directed graph
+    each connection also gets an arrowhead at its target, as
+    draw_networkx_edges(arrows=True) drew; undirected graphs get plain lines,
+    as they did there. Terminal stops are the ones with upper-case names, as
+    in the original drawing.
+
+    Once attached to a canvas the changing artists are animated and blitted
+    over a cached background, so a status change repaints without a full
+    figure draw. Stop labels are the costly part of a draw (glyph rendering),
+    so each label is pre-rendered once per view and composited as an image.
+
+    Hover tooltips and clicks are resolved through a grid index over the
+    stop positions, so a mouse move only looks at the stops near the pointer.
+    """
+
+    def __init__(self, ax):
+        self.ax = ax
+        self.nodes: List[str] = []
+        self.index: Dict[str, int] = {}
+        self.positions = np.empty((0, 2))
+        self.names: List[str] = []
+        self.active = np.zeros(0, dtype=bool)
+        self.terminal = np.zeros(0, dtype=bool)
+        self._edges: List[Tuple[int, int]] = []
+        self._directed = False
+        self._labels: Dict[int, object] = {}
+        self._circle_colours = np.empty((0, 4))
+        self._square_colours = np.empty((0, 4))
+        self.hit_index: GridIndex[int] = GridIndex(1.0)
+        self.canvas = None
+        self.tooltip = None
+        self._hovered: Optional[int] = None
+        self._background = None
+        self._label_images: Optional[Dict[int, Tuple[int, int, np.ndarray]]] = None
+
+        self.edge_collection = LineCollection([], colors=EDGE_COLOR, linewidths=1.5, alpha=0.8, zorder=1)
+        ax.add_collection(self.edge_collection)
+        # One unit-size path per arrowhead, in points around its target stop (sizes=[1] is 1 pt)
+        self.arrow_collection = PathCollection([], sizes=[1.0], offsets=np.empty((0, 2)),
+                                               offset_transform=ax.transData, transform=IdentityTransform(),
+                                               facecolors=EDGE_COLOR,
+                                               linewidths=0, alpha=0.8, zorder=1)
+        ax.add_collection(self.arrow_collection)
+        self.squares = ax.scatter([], [], marker='s', s=INACTIVE_SIZE, linewidths=0, zorder=2)
+        self.circles = ax.scatter([], [], marker='o', linewidths=0, zorder=2)
+        self.title = ax.set_title("", fontsize=9, pad=12)
+
+        ax.set_axis_off()
+        ax.legend(handles=[
+            Line2D([0], [0], marker='o', color='w', label='Terminal Stop',
+                   markerfacecolor=NODE_COLOR, markersize=8),
+            Line2D([0], [0], marker='o', color='w', label='Regular Stop',
+                   markerfacecolor=NODE_COLOR, markersize=8, alpha=REGULAR_ALPHA),
+            Line2D([0], [0], marker='s', color='w', label='Inactive Stop',
+                   markerfacecolor=NODE_COLOR, markersize=8, alpha=INACTIVE_ALPHA),
+            Line2D([0], [0], color=EDGE_COLOR, lw=1.5, label='Active Connection')
+        ], loc='upper right', fontsize=7)
+
+    def attach(self, canvas):
+        """Start blitting on this canvas (call before its first draw)"""
+        self.canvas = canvas
+        for artist in self._animated_artists():
+            artist.set_animated(True)
+        canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _animated_artists(self) -> list:
+        artists = [self.edge_collection, self.arrow_collection, self.squares, self.circles,
+                   *self._labels.values(), self.title]
+        return artists + [self.tooltip] if self.tooltip is not None else artists
+
+    def enable_hover(self, on_click: Optional[Callable[[str], None]] = None, is_enabled: Optional[Callable[[], bool]] = None):
+        """Show a tooltip for the stop under the pointer and report clicked stops.
+
+        is_enabled lets the caller suspend both, e.g. while a toolbar
+        zoom/pan mode owns the mouse.
+        """
+        self.tooltip = self.ax.annotate("", xy=(0, 0), xytext=(10, 10), textcoords='offset points',
+                                        bbox=dict(boxstyle='round,pad=0.5', fc='yellow', alpha=0.5),
+                                        arrowprops=dict(arrowstyle='->'), zorder=4,
+                                        animated=self.canvas is not None, visible=False)
+
+        def on_move(event):
+            enabled = is_enabled is None or is_enabled()
+            i = self.stop_index_at(event.x, event.y) if enabled and event.inaxes is self.ax else None
+            if i != self._hovered:
+                self._hovered = i
+                if i is not None:
+                    self.tooltip.xy = tuple(self.positions[i])
+                    self.tooltip.set_text(self.names[i])
+                self.tooltip.set_visible(i is not None)
+                self.redraw()
+
+        def on_press(event):
+            if event.button != 1 or event.inaxes is not self.ax or (is_enabled is not None and not is_enabled()):
+                return
+            i = self.stop_index_at(event.x, event.y)
+            if i is not None:
+                on_click(self.nodes[i])
+
+        self.canvas.mpl_connect('motion_notify_event', on_move)
+        if on_click is not None:
+            self.canvas.mpl_connect('button_press_event', on_press)
+
+    def stop_index_at(self, x: float, y: float, radius: float = HIT_RADIUS_PX) -> Optional[int]:
+        """Index of the stop nearest to display point (x, y) within radius pixels"""
+        if not len(self.positions):
+            return None
+        # The axes scale x and y differently, so search the data-space box
+        # covering the pixel radius and measure the candidates in pixels
+        to_data = self.ax.transData.inverted()
+        (x0, y0), (x1, y1) = to_data.transform([(x - radius, y - radius), (x + radius, y + radius)])
+        candidates = self.hit_index.within(min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1))
+        if not candidates:
+            return None
+        screen = self.ax.transData.transform(self.positions[candidates])
+        distances = np.hypot(screen[:, 0] - x, screen[:, 1] - y)
+        best = int(np.argmin(distances))
+        return candidates[best] if distances[best] <= radius else None
+
+    def _on_draw(self, event):
+        # Arrowheads point along the connections on screen, which zoom, pan and resize change
+        self._update_arrows()
+        if event.canvas is not self.canvas:
+            # Saving to a vector format through a temporary canvas: no blitting,
+            # just draw the animated artists onto that renderer in order
+            for artist in self._animated_artists():
+                artist.draw(event.renderer)
+            return
+        # A full draw (first show, zoom, pan, resize) renders everything but the
+        # animated artists; keep that as the background and put them on top
+        self._background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._label_images = None
+        self._draw_animated()
+
+    def _draw_animated(self):
+        ax = self.ax
+        for artist in (self.edge_collection, self.arrow_collection, self.squares, self.circles):
+            ax.draw_artist(artist)
+
+        renderer = self.canvas.get_renderer()
+        if self._label_images is None:
+            self._label_images = self._render_labels(renderer)
+        gc = renderer.new_gc()
+        for i, (x, y, image) in self._label_images.items():
+            if self.active[i]:
+                renderer.draw_image(gc, x, y, image)
+        gc.restore()
+
+        ax.draw_artist(self.title)
+        if self.tooltip is not None and self.tooltip.get_visible():
+            ax.draw_artist(self.tooltip)
+
+    def _render_labels(self, renderer) -> Dict[int, Tuple[int, int, np.ndarray]]:
+        """Pre-render each label once as a small RGBA image placed at its display position"""
+        width, height = int(renderer.width), int(renderer.height)
+        layer = RendererAgg(width, height, self.canvas.figure.dpi)
+        images = {}
+        for i, label in self._labels.items():
+            layer.clear()
+            label.set_visible(True)
+            label.draw(layer)
+            label.set_visible(bool(self.active[i]))
+            extent = Bbox.union([label.get_window_extent(layer), label.get_bbox_patch().get_window_extent(layer)])
+            x0, y0 = max(int(extent.x0) - 2, 0), max(int(extent.y0) - 2, 0)
+            x1, y1 = min(int(extent.x1) + 3, width), min(int(extent.y1) + 3, height)
+            if x0 < x1 and y0 < y1:
+                # Agg buffers are stored top row first; draw_image wants bottom row first
+                images[i] = (x0, y0, np.asarray(layer.buffer_rgba())[::-1][y0:y1, x0:x1].copy())
+        return images
+
+    def redraw(self):
+        """Show the latest update: a blit if the background is still valid, else a full draw"""
+        if self.canvas is None:
+            return
+        if self._background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_animated()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def update(self, graph, pos: Dict[str, Tuple[float, float]]) -> Dict[str, int]:
+        """Bring the artists in line with the graph; returns how many stops/edges were touched"""
+        nodes = [node for node in graph.nodes if node in pos]
+        positions = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+        names = [graph.nodes[node].get('name') or str(node) for node in nodes]
+        active = np.array([bool(graph.nodes[node].get('active')) for node in nodes], dtype=bool)
+
+        if nodes != self.nodes or names != self.names or not np.array_equal(positions, self.positions):
+            self._set_nodes(nodes, positions, names, active)
+            changed_nodes = len(nodes)
+        else:
+            changed = np.flatnonzero(active != self.active)
+            self.active = active
+            self._recolour(changed)
+            changed_nodes = len(changed)
+
+        directed = graph.is_directed()
+        edges = sorted(
+            (self.index[u], self.index[v]) if directed else
+            (min(self.index[u], self.index[v]), max(self.index[u], self.index[v]))
+            for u, v, data in graph.edges(data=True)
+            if data.get('active', False) and u in self.index and v in self.index
+        )
+        changed_edges = 0
+        if edges != self._edges or directed != self._directed:
+            changed_edges = len(set(edges).symmetric_difference(self._edges or ()))
+            self._edges, self._directed = edges, directed
+            self.edge_collection.set_segments(self.positions[np.array(edges, dtype=int).reshape(-1, 2)])
+            self._update_arrows()
+
+        self.title.set_text(f"Tram Network (Status: {int(self.active.sum())}/{len(graph.nodes())} active stops)")
+        return {'stops': changed_nodes, 'edges': changed_edges}
+
+    def _update_arrows(self):
+        """Arrowhead paths for the directed connections, rotated to their direction on screen"""
+        edges = np.array((self._edges or []) if self._directed else [], dtype=int).reshape(-1, 2)
+        ends = self.ax.transData.transform(self.positions[edges.ravel()]).reshape(-1, 2, 2)
+        direction = ends[:, 1] - ends[:, 0]
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        keep = length > 0
+        edges, direction = edges[keep], direction[keep] / length[keep, None]
+
+        # Triangle in (along, across) coordinates, tip just outside the target stop's marker
+        shape = np.array([(-ARROW_TIP, 0.0), (-ARROW_TIP - ARROW_LENGTH, ARROW_HALF_WIDTH),
+                          (-ARROW_TIP - ARROW_LENGTH, -ARROW_HALF_WIDTH), (-ARROW_TIP, 0.0)])
+        along, across = direction, direction[:, ::-1] * (-1, 1)
+        vertices = shape[None, :, :1] * along[:, None] + shape[None, :, 1:] * across[:, None]
+        codes = [Path.MOVETO, Path.LINETO, Path.LINETO, Path.CLOSEPOLY]
+        self.arrow_collection.set_paths([Path(v, codes) for v in vertices])
+        self.arrow_collection.set_offsets(self.positions[edges[:, 1]])
+
+    def _set_nodes(self, nodes: List[str], positions: np.ndarray, names: List[str], active: np.ndarray):
+        """Full rebuild of the stop artists, needed when stops are added, removed or moved"""
+        self.nodes, self.positions, self.names, self.active = nodes, positions, names, active
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.terminal = np.array([name.isupper() for name in names], dtype=bool)
+        self._edges = None  # segments index into positions, so always rebuild them
+
+        extent = float(np.ptp(positions, axis=0).max()) if len(positions) else 0.0
+        self.hit_index = GridIndex(extent / 64 if extent > 0 else 1.0,
+                                   ((x, y, i) for i, (x, y) in enumerate(positions.tolist())))
+        self._hovered = None
+        if self.tooltip is not None:
+            self.tooltip.set_visible(False)
+
+        self.squares.set_offsets(positions)
+        self.circles.set_offsets(positions)
+        self.circles.set_sizes(np.where(self.terminal, TERMINAL_SIZE, REGULAR_SIZE))
+
+        for label in self._labels.values():
+            label.remove()
+        # New positions and axis limits: the cached background is stale
+        self._background = None
+        self._label_images = None
+        self._labels = {
+            i: self.ax.text(positions[i, 0], positions[i, 1], names[i], fontsize=7, fontweight='bold',
+                            ha='center', va='center', zorder=3,
+                            bbox=dict(facecolor='white', alpha=0.8, edgecolor='none', boxstyle='round,pad=0.2'),
+                            animated=self.canvas is not None)
+            for i in np.flatnonzero(self.terminal)
+        }
+        self._recolour(np.arange(len(nodes)), full=True)
+
+        if len(positions):
+            self.ax.set_xlim(positions[:, 0].min() - 0.01, positions[:, 0].max() + 0.01)
+            self.ax.set_ylim(positions[:, 1].min() - 0.01, positions[:, 1].max() + 0.01)
+
+    def _recolour(self, changed: np.ndarray, full: bool = False):
+        if not full and not len(changed):
+            return
+        if full:
+            self._circle_colours = np.tile(to_rgba(NODE_COLOR), (len(self.nodes), 1))
+            self._square_colours = self._circle_colours.copy()
+        active = self.active[changed]
+        self._circle_colours[changed, 3] = np.where(
+            active, np.where(self.terminal[changed], TERMINAL_ALPHA, REGULAR_ALPHA), 0.0)
+        self._square_colours[changed, 3] = np.where(active, 0.0, INACTIVE_ALPHA)
+        self.circles.set_facecolors(self._circle_colours)
+        self.squares.set_facecolors(self._square_colours)
+        for i in changed:
+            label = self._labels.get(int(i))
+            if label is not None:
+                label.set_visible(bool(self.active[i]))
+
@@ -0,0 +1,250 @@
+import json
+import os
+import sqlite3
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db_handler import TramDatabase
+
+MAGIC = b'TRAMSNAP'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def snapshot_path_for(db_file: str) -> str:
+    return os.path.splitext(db_file)[0] + '.snapshot'
+
+
+def _encode_strings(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob plus (n + 1) offsets, so strings are sliced out without parsing"""
+    encoded = [value.encode('utf-8') for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def _read_network(conn: sqlite3.Connection) -> Tuple[int, Dict[str, np.ndarray]]:
+    cursor = conn.cursor()
+    cursor.execute("SELECT revision FROM data_revisions WHERE name = 'network'")
+    row = cursor.fetchone()
+    revision = row[0] if row else 0
+
+    # Same row order as TramDatabase.create_network_graph
+    cursor.execute('SELECT stop_id, stop_name, latitude, longitude, active_status FROM stops')
+    stops = cursor.fetchall()
+    stop_index = {stop[0]: i for i, stop in enumerate(stops)}
+
+    cursor.execute('SELECT DISTINCT line_number FROM connections UNION SELECT line_number FROM stop_line_relations')
+    lines = sorted(line for line, in cursor.fetchall())
+    line_index = {line: i for i, line in enumerate(lines)}
+
+    cursor.execute('SELECT from_stop, to_stop, weight, line_number FROM connections ORDER BY connection_id')
+    edges = [edge for edge in cursor.fetchall() if edge[0] in stop_index and edge[1] in stop_index]
+
+    cursor.execute('SELECT DISTINCT stop_id, line_number FROM stop_line_relations')
+    stop_lines = sorted((stop_index[stop_id], line_index[line]) for stop_id, line in cursor.fetchall() if stop_id in stop_index)
+
+    n, m = len(stops), len(edges)
+    arrays = {}
+    arrays['stop_id_offsets'], arrays['stop_id_blob'] = _encode_strings([stop[0] for stop in stops])
+    arrays['name_offsets'], arrays['name_blob'] = _encode_strings([stop[1] for stop in stops])
+    arrays['line_offsets'], arrays['line_blob'] = _encode_strings(lines)
+    arrays['lat'] = np.array([stop[2] if stop[2] is not None else np.nan for stop in stops], dtype=np.float64)
+    arrays['lng'] = np.array([stop[3] if stop[3] is not None else np.nan for stop in stops], dtype=np.float64)
+    arrays['active'] = np.array([stop[4] == 'yes' for stop in stops], dtype=np.uint8)
+
+    # Connections in connection_id order (COO), plus an undirected CSR adjacency over them
+    edge_from = np.array([stop_index[edge[0]] for edge in edges], dtype=np.int32)
+    edge_to = np.array([stop_index[edge[1]] for edge in edges], dtype=np.int32)
+    arrays['edge_from'], arrays['edge_to'] = edge_from, edge_to
+    arrays['edge_weight'] = np.array([edge[2] for edge in edges], dtype=np.float64)
+    arrays['edge_line'] = np.array([line_index.get(edge[3], -1) for edge in edges], dtype=np.int32)
+
+    ends = np.concatenate([edge_from, edge_to])
+    others = np.concatenate([edge_to, edge_from])
+    edge_ids = np.concatenate([np.arange(m, dtype=np.int32)] * 2)
+    order = np.argsort(ends, kind='stable')
+    arrays['csr_indptr'] = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ends, minlength=n), out=arrays['csr_indptr'][1:])
+    arrays['csr_neighbour'] = others[order].astype(np.int32)
+    arrays['csr_edge'] = edge_ids[order]
+
+    stop_line_stops = np.array([stop for stop, _ in stop_lines], dtype=np.int64)
+    arrays['stop_lines_indptr'] = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(stop_line_stops, minlength=n), out=arrays['stop_lines_indptr'][1:])
+    arrays['stop_lines'] = np.array([line for _, line in stop_lines], dtype=np.int32)
+    return revision, arrays
+
+
+def write_snapshot(db_file: str = 'tram_data2.db', path: Optional[str] = None) -> str:
+    """Write the binary snapshot of the network tables, replacing any previous one atomically"""
+    path = path or snapshot_path_for(db_file)
+    db = TramDatabase(db_file)
+    db.ensure_schema()
+    with db._get_connection() as conn:
+        # One read transaction so the revision matches the rows
+        conn.execute('BEGIN')
+        try:
+            revision, arrays = _read_network(conn)
+        finally:
+            conn.rollback()
+
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        layout[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({'version': FORMAT_VERSION, 'revision': revision, 'arrays': layout}).encode('utf-8')
+    preamble = MAGIC + struct.pack('<I', len(header)) + header
+    data_start = -(-len(preamble) // ALIGNMENT) * ALIGNMENT
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(preamble.ljust(data_start, b'\0'))
+        for name, array in arrays.items():
+            file.seek(data_start + layout[name]['offset'])
+            file.write(array.tobytes())
+        file.truncate(data_start + offset)
+    os.replace(temp_path, path)
+    return path
+
+
+class NetworkSnapshot:
+    """Read-only, memory-mapped view of a network snapshot file.
+
+    Arrays are numpy views into one shared mapping, so every process that
+    opens the same file shares the physical pages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            preamble = file.read(len(MAGIC) + 4)
+            if preamble[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a network snapshot")
+            header_length = struct.unpack('<I', preamble[len(MAGIC):])[0]
+            header = json.loads(file.read(header_length))
+        if header['version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {header['version']}")
+
+        self.revision: int = header['revision']
+        data_start = -(-(len(MAGIC) + 4 + header_length) // ALIGNMENT) * ALIGNMENT
+        self._mapping = np.memmap(path, dtype=np.uint8, mode='r')
+        self.arrays: Dict[str, np.ndarray] = {}
+        for name, spec in header['arrays'].items():
+            dtype = np.dtype(spec['dtype'])
+            count = int(np.prod(spec['shape'])) if spec['shape'] else 1
+            start = data_start + spec['offset']
+            self.arrays[name] = self._mapping[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+        self._stop_ids: Optional[List[str]] = None
+        self._stop_index: Optional[Dict[str, int]] = None
+
+    def __len__(self):
+        return len(self.arrays['lat'])
+
+    def _strings(self, prefix: str) -> List[str]:
+        offsets, blob = self.arrays[f'{prefix}_offsets'], self.arrays[f'{prefix}_blob'].tobytes()
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+
+    @property
+    def stop_ids(self) -> List[str]:
+        if self._stop_ids is None:
+            self._stop_ids = self._strings('stop_id')
+        return self._stop_ids
+
+    @property
+    def names(self) -> List[str]:
+        return self._strings('name')
+
+    @property
+    def lines(self) -> List[str]:
+        return self._strings('line')
+
+    def index_of(self, stop_id: str) -> Optional[int]:
+        if self._stop_index is None:
+            self._stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        return self._stop_index.get(stop_id)
+
+    def neighbours(self, i: int) -> np.ndarray:
+        """Stop indices connected to stop i in either direction, once per connection"""
+        indptr = self.arrays['csr_indptr']
+        return self.arrays['csr_neighbour'][indptr[i]:indptr[i + 1]]
+
+    def lines_of(self, i: int) -> List[str]:
+        indptr = self.arrays['stop_lines_indptr']
+        lines = self.lines
+        return [lines[line] for line in self.arrays['stop_lines'][indptr[i]:indptr[i + 1]]]
+
+    def to_graph(self):
+        """NetworkX graph with the same nodes, attributes and edges as TramDatabase.create_network_graph
+
+        Edges are added in connection_id order.
+        """
+        import networkx as nx
+
+        stop_ids, names = self.stop_ids, self.names
+        lat, lng = self.arrays['lat'], self.arrays['lng']
+        active = self.arrays['active'].astype(bool)
+
+        G = nx.Graph()
+        for i, stop_id in enumerate(stop_ids):
+            has_pos = not (np.isnan(lat[i]) or np.isnan(lng[i])) and lat[i] and lng[i]
+            G.add_node(
+                stop_id,
+                name=names[i],
+                active=bool(active[i]),
+                pos=(float(lng[i]), float(lat[i])) if has_pos else None,
+                color='#2ecc71' if active[i] else '#e74c3c'
+            )
+
+        edge_from, edge_to = self.arrays['edge_from'], self.arrays['edge_to']
+        keep = active[edge_from] & active[edge_to]
+        weights = self.arrays['edge_weight']
+        for u, v, weight in zip(edge_from[keep].tolist(), edge_to[keep].tolist(), weights[keep].tolist()):
+            G.add_edge(stop_ids[u], stop_ids[v], weight=int(weight) if weight.is_integer() else weight, active=True)
+        return G
+
+
+_snapshots: Dict[str, Tuple[int, NetworkSnapshot]] = {}
+_snapshots_lock = threading.Lock()
+
+
+def load_network_snapshot(db_file: str = 'tram_data2.db', rebuild: bool = True) -> Optional[NetworkSnapshot]:
+    """Snapshot matching the database's current network revision.
+
+    A missing or stale file is rewritten when rebuild is set, otherwise None
+    is returned. Open snapshots are reused until the file is replaced.
+    """
+    path = snapshot_path_for(db_file)
+    revision = TramDatabase(db_file).get_revision('network')
+    with _snapshots_lock:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        cached = _snapshots.get(path)
+        if cached is not None and cached[0] == mtime and cached[1].revision == revision:
+            return cached[1]
+
+        snapshot = None
+        if mtime is not None:
+            try:
+                snapshot = NetworkSnapshot(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Ignoring unreadable network snapshot {path}: {e}")
+        if snapshot is None or snapshot.revision != revision:
+            if not rebuild:
+                return None
+            write_snapshot(db_file, path)
+            snapshot = NetworkSnapshot(path)
+            mtime = os.stat(path).st_mtime_ns
+
+        _snapshots[path] = (mtime, snapshot)
+        return snapshot
@@ -2,9 +2,10 @@ import os
 import glob
 import xml.etree.ElementTree as ET
 from collections import defaultdict
+import numpy as np
 import pandas as pd
 import logging
-from db_handler import TramDatabase
+from traffic_store import DAYS, HOURS, get_traffic_store
 import sqlite3
 
     
@@ -68,33 +69,18 @@ def parse_xml_schedule_for_line(xml_folder, line_no):
 
 
 def get_traffic_data_from_db():
-    """Improved traffic data fetcher with detailed logging"""
-    db = TramDatabase()
+    """Traffic records in long format, served from the shared traffic cube"""
     try:
-        with db._get_connection() as conn:
-            # Adjusted query to match the actual schema
-            query = """
-                SELECT 
-                    stop_id as 'Stop ID',
-                    day_of_week as 'Day',
-                    hour as 'Hour',
-                    congestion_percent as 'traffic_percent'
-                FROM traffic_patterns
-                ORDER BY stop_id, day_of_week, hour
-            """
-            df = pd.read_sql(query, conn)
-
-            # Ensure proper data types
-            if not df.empty:
-                df['Hour'] = df['Hour'].astype(str).str.split(':').str[0]
-                df['Hour'] = df['Hour'].apply(lambda x: f"{int(x):02d}")
-
-            logging.info(f"Retrieved {len(df)} traffic records from DB")
-            if df.empty:
-                logging.warning("Traffic data is empty. Check if the traffic_patterns table is populated.")
-            else:
-                logging.debug(f"Traffic data sample:\n{df.head()}")
-            return df
+        # The store only re-reads traffic_patterns when the table changed; copy so
+        # callers can add columns without touching the cached frame
+        df = get_traffic_store().to_frame().copy()
+
+        logging.info(f"Retrieved {len(df)} traffic records from DB")
+        if df.empty:
+            logging.warning("Traffic data is empty. Check if the traffic_patterns table is populated.")
+        else:
+            logging.debug(f"Traffic data sample:\n{df.head()}")
+        return df
 
     except Exception as e:
         logging.error(f"Error fetching traffic data: {e}")
@@ -330,19 +316,17 @@ def optimize_without_merging(xml_folder, line_no, day_type, variant=None, max_tr
     )
 
     # Get traffic data
-    traffic_df = get_traffic_data_from_db()
-    if traffic_df.empty:
+    store = get_traffic_store()
+    cube = store.cube
+    if np.isnan(cube).all():
         logging.warning("No traffic data available")
         return pd.DataFrame()
 
-    # Normalize traffic data
-    traffic_df['normalized_traffic'] = (
-        (traffic_df['traffic_percent'] - traffic_df['traffic_percent'].min()) /
-        (traffic_df['traffic_percent'].max() - traffic_df['traffic_percent'].min() + 0.001)
-    ).clip(0.1, 0.9)
+    # Normalize traffic data over the whole cube (NaN cells stay NaN)
+    min_t, max_t = np.nanmin(cube), np.nanmax(cube)
+    normalized = ((cube - min_t) / (max_t - min_t + 0.001)).clip(0.1, 0.9)
 
     logging.info(f"Schedule DataFrame: {schedule_df.head()}")
-    logging.info(f"Traffic DataFrame: {traffic_df.head()}")
     logging.info(f"Day Type Mapped: {day_type_mapped}")
     logging.info(f"Passes Per Hour DataFrame: {passes_per_hour.head()}")
 
@@ -351,19 +335,23 @@ def optimize_without_merging(xml_folder, line_no, day_type, variant=None, max_tr
     for stop_id in passes_per_hour['Stop ID'].unique():
         logging.info(f"Processing Stop ID: {stop_id}")
         stop_data = passes_per_hour[passes_per_hour['Stop ID'] == stop_id]
-        traffic_data = traffic_df[traffic_df['Stop ID'] == stop_id]
+        stop_idx = store.stop_index.get(stop_id)
         logging.info(f"Stop Data: {stop_data}")
-        logging.info(f"Traffic Data: {traffic_data}")
 
         stop_matrix = []
         for hour in stop_data['Hour'].unique():
             schedule_passes = stop_data[stop_data['Hour'] == hour]['passes'].sum()
-            traffic_intensity = traffic_data[traffic_data['Hour'] == hour]['normalized_traffic'].mean()
 
-            logging.info(f"Hour: {hour}, Scheduled Passes: {schedule_passes}, Traffic Intensity: {traffic_intensity}")
+            # Mean over all days of the week for this stop and hour
+            traffic_intensity = 0.5  # Default to midpoint if no traffic data
+            hour_int = int(hour)
+            if stop_idx is not None and 0 <= hour_int < HOURS:
+                values = normalized[stop_idx, :, hour_int]
+                values = values[~np.isnan(values)]
+                if values.size:
+                    traffic_intensity = float(values.mean())
 
-            if pd.isna(traffic_intensity):
-                traffic_intensity = 0.5  # Default to midpoint if no traffic data
+            logging.info(f"Hour: {hour}, Scheduled Passes: {schedule_passes}, Traffic Intensity: {traffic_intensity}")
 
             optimal_trips = min(max_trips_per_hour * traffic_intensity, schedule_passes)
             stop_matrix.append({
@@ -410,7 +398,7 @@ def main():
 def optimize_lines(_, lines, day_type=None, variant=None):
     xml_folder = './xmls/'
     results = []
-    traffic_df = get_traffic_data_from_db()
+    store = get_traffic_store()
 
     day_type_map = {
         'workday': 'w dni robocze',
@@ -431,37 +419,38 @@ def optimize_lines(_, lines, day_type=None, variant=None):
             continue
 
         stop_ids = schedule_df['Stop ID'].unique().tolist()
-        relevant_traffic = traffic_df[traffic_df['Stop ID'].isin(stop_ids)]
-        if relevant_traffic.empty:
+        relevant_traffic = store.for_stops(stop_ids).astype(np.float64)
+        present = ~np.isnan(relevant_traffic)
+        counts = present.sum(axis=0)
+        has_data = counts > 0
+        if not has_data.any():
             continue
 
-        agg_traffic = (
-            relevant_traffic.groupby(['Day', 'Hour'], as_index=False)
-            .agg({'traffic_percent': 'mean'})
-        )
+        # Mean over the line's stops for every (day, hour) cell that has data
+        sums = np.where(present, relevant_traffic, 0.0).sum(axis=0)
+        agg_traffic = np.divide(sums, counts, out=np.zeros_like(sums), where=has_data)
 
-        min_t, max_t = agg_traffic['traffic_percent'].min(), agg_traffic['traffic_percent'].max()
+        min_t, max_t = agg_traffic[has_data].min(), agg_traffic[has_data].max()
         if max_t - min_t < 0.001:
-            agg_traffic['normalized_traffic'] = 0.5
+            normalized_traffic = np.full_like(agg_traffic, 0.5)
         else:
-            agg_traffic['normalized_traffic'] = (
-                (agg_traffic['traffic_percent'] - min_t) / (max_t - min_t + 0.001)
-            )
-        agg_traffic['normalized_traffic'] = agg_traffic['normalized_traffic'].clip(0.1, 0.9)
+            normalized_traffic = (agg_traffic - min_t) / (max_t - min_t + 0.001)
+        normalized_traffic = normalized_traffic.clip(0.1, 0.9)
 
         max_trips = 7
-        agg_traffic['proposed_trips'] = (
-            agg_traffic['normalized_traffic'] * max_trips
-        ).round().astype(int).clip(lower=1)
-
-        for _, row in agg_traffic.iterrows():
-            results.append({
-                'line': line_no,
-                'variant': variant or '',
-                'day': row['Day'],
-                'hour': row['Hour'],
-                'proposed_trips': int(row['proposed_trips'])
-            })
+        proposed_trips = np.round(normalized_traffic * max_trips).astype(int).clip(min=1)
+
+        # Same row order as the previous groupby on (Day, Hour)
+        for day in sorted(DAYS):
+            day_idx = DAYS.index(day)
+            for hour in np.flatnonzero(has_data[day_idx]):
+                results.append({
+                    'line': line_no,
+                    'variant': variant or '',
+                    'day': day,
+                    'hour': f"{hour:02d}",
+                    'proposed_trips': int(proposed_trips[day_idx, hour])
+                })
 
     return results
 
@@ -0,0 +1,170 @@
+import heapq
+import math
+from collections import defaultdict
+from typing import Callable, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+V = TypeVar('V')
+
+METRES_PER_DEGREE_LAT = 110_574.0
+METRES_PER_DEGREE_LNG_AT_EQUATOR = 111_320.0
+
+
+class GridIndex(Generic[V]):
+    """Uniform grid over planar (x, y) points for box and k-nearest queries.
+
+    Both queries only visit the cells around the query, so their cost depends
+    on local density rather than on the total number of points.
+    """
+
+    def __init__(self, cell_size: float, points: Iterable[Tuple[float, float, V]] = ()):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = cell_size
+        self._cells: Dict[Tuple[int, int], List[Tuple[float, float, V]]] = defaultdict(list)
+        self._count = 0
+        self._bounds: Optional[List[int]] = None  # [min_cx, min_cy, max_cx, max_cy]
+        for x, y, value in points:
+            self.add(x, y, value)
+
+    def __len__(self):
+        return self._count
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def add(self, x: float, y: float, value: V):
+        cx, cy = self._cell(x, y)
+        self._cells[(cx, cy)].append((x, y, value))
+        self._count += 1
+        if self._bounds is None:
+            self._bounds = [cx, cy, cx, cy]
+        else:
+            bounds = self._bounds
+            bounds[0], bounds[1] = min(bounds[0], cx), min(bounds[1], cy)
+            bounds[2], bounds[3] = max(bounds[2], cx), max(bounds[3], cy)
+
+    def within(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[V]:
+        """Values of points inside the box (edges included)"""
+        if not all(math.isfinite(bound) for bound in (min_x, min_y, max_x, max_y)):
+            raise ValueError("box must be finite")
+        if self._bounds is None:
+            return []
+        min_cx, min_cy = self._cell(min_x, min_y)
+        max_cx, max_cy = self._cell(max_x, max_y)
+        min_cx, min_cy = max(min_cx, self._bounds[0]), max(min_cy, self._bounds[1])
+        max_cx, max_cy = min(max_cx, self._bounds[2]), min(max_cy, self._bounds[3])
+
+        found = []
+        for cx in range(min_cx, max_cx + 1):
+            for cy in range(min_cy, max_cy + 1):
+                for x, y, value in self._cells.get((cx, cy), ()):
+                    if min_x <= x <= max_x and min_y <= y <= max_y:
+                        found.append(value)
+        return found
+
+    def _ring(self, cx: int, cy: int, radius: int) -> Iterable[Tuple[int, int]]:
+        """Cells at Chebyshev distance radius from (cx, cy), clamped to the occupied bounds"""
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        if radius == 0:
+            if min_cx <= cx <= max_cx and min_cy <= cy <= max_cy:
+                yield cx, cy
+            return
+        x0, x1 = max(cx - radius, min_cx), min(cx + radius, max_cx)
+        for row in (cy - radius, cy + radius):
+            if min_cy <= row <= max_cy:
+                for column in range(x0, x1 + 1):
+                    yield column, row
+        y0, y1 = max(cy - radius + 1, min_cy), min(cy + radius - 1, max_cy)
+        for column in (cx - radius, cx + radius):
+            if min_cx <= column <= max_cx:
+                for row in range(y0, y1 + 1):
+                    yield column, row
+
+    def nearest(self, x: float, y: float, k: int = 1, max_distance: Optional[float] = None,
+                where: Optional[Callable[[V], bool]] = None) -> List[Tuple[float, V]]:
+        """Up to k (distance, value) pairs closest to (x, y), nearest first.
+
+        Rings of cells are searched outwards, starting at the first ring that
+        reaches the occupied cells and only over the occupied bounds, until the
+        k-th best distance is closer than anything an unvisited ring could
+        hold. A query far from the points therefore costs no more than one
+        pass over the occupied cells.
+        """
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError("query point must be finite")
+        if max_distance is not None and (math.isnan(max_distance) or max_distance < 0):
+            raise ValueError("max_distance must be a non-negative number")
+        if self._bounds is None or k <= 0:
+            return []
+        cx, cy = self._cell(x, y)
+        min_cx, min_cy, max_cx, max_cy = self._bounds
+        # Rings closer than the occupied bounds are empty, rings past their far edge too
+        min_radius = max(min_cx - cx, cx - max_cx, min_cy - cy, cy - max_cy, 0)
+        max_radius = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy, 0)
+        if max_distance is not None and math.isfinite(max_distance):
+            max_radius = min(max_radius, math.ceil(max_distance / self.cell_size))
+
+        best: List[Tuple[float, int, V]] = []  # max-heap on distance via negation
+        sequence = 0
+        for radius in range(min_radius, max_radius + 1):
+            for cell in self._ring(cx, cy, radius):
+                for px, py, value in self._cells.get(cell, ()):
+                    distance = math.hypot(px - x, py - y)
+                    if max_distance is not None and distance > max_distance:
+                        continue
+                    if where is not None and not where(value):
+                        continue
+                    sequence += 1
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, sequence, value))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, sequence, value))
+            # Every point within radius * cell_size of the query has been visited
+            if len(best) == k and -best[0][0] <= radius * self.cell_size:
+                break
+
+        return [(-negated, value) for negated, _, value in sorted(best, key=lambda item: (-item[0], item[1]))]
+
+
+class StopLocator:
+    """Stops in a grid over a local metric projection, for nearest-stop and viewport queries.
+
+    Coordinates are projected equirectangularly around the stops' mean
+    latitude, which is accurate to well under a metre across a city.
+    """
+
+    def __init__(self, stops: Iterable[Dict], cell_metres: float = 250.0):
+        located = [stop for stop in stops if stop.get('lat') is not None and stop.get('lng') is not None]
+        origin_lat = sum(stop['lat'] for stop in located) / len(located) if located else 0.0
+        self._metres_per_lng = METRES_PER_DEGREE_LNG_AT_EQUATOR * math.cos(math.radians(origin_lat))
+        points = [self.project(stop['lat'], stop['lng']) + (stop,) for stop in located]
+        self.grid: GridIndex[Dict] = GridIndex(cell_metres, points)
+        # (min_x, min_y, max_x, max_y) in metres
+        self._bounds = (min(p[0] for p in points), min(p[1] for p in points),
+                        max(p[0] for p in points), max(p[1] for p in points)) if points else None
+
+    def __len__(self):
+        return len(self.grid)
+
+    def project(self, lat: float, lng: float) -> Tuple[float, float]:
+        """(x, y) in metres"""
+        return lng * self._metres_per_lng, lat * METRES_PER_DEGREE_LAT
+
+    def nearest(self, lat: float, lng: float, k: int = 5, max_distance_m: Optional[float] = None,
+                where: Optional[Callable[[Dict], bool]] = None) -> List[Tuple[float, Dict]]:
+        """(distance in metres, stop) pairs, nearest first"""
+        x, y = self.project(lat, lng)
+        return self.grid.nearest(x, y, k=k, max_distance=max_distance_m, where=where)
+
+    def distance_to_bounds(self, lat: float, lng: float) -> float:
+        """Metres from the point to the box around all stops (0 inside it, inf with no stops)"""
+        if self._bounds is None:
+            return math.inf
+        x, y = self.project(lat, lng)
+        min_x, min_y, max_x, max_y = self._bounds
+        return math.hypot(max(min_x - x, 0.0, x - max_x), max(min_y - y, 0.0, y - max_y))
+
+    def within_bbox(self, min_lng: float, min_lat: float, max_lng: float, max_lat: float) -> List[Dict]:
+        min_x, min_y = self.project(min_lat, min_lng)
+        max_x, max_y = self.project(max_lat, max_lng)
+        return self.grid.within(min_x, min_y, max_x, max_y)
@@ -0,0 +1,111 @@
+"""Cold-start import benchmark for the app.py and GUI.py entry points.
+
+Each run imports the entry point in a fresh interpreter with -X importtime
+and reports the median total import time, the wall-clock time of the whole
+process and the heaviest direct imports. Exits non-zero if an entry point
+goes over its budget or loads a module that should only be imported lazily.
+
+    python startup_benchmark.py [--runs 5] [--top 8] [app GUI]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Import-time budgets in seconds (median of the runs)
+BUDGETS = {
+    'app': 0.30,
+    'GUI': 0.90,
+}
+
+# Modules that must not be loaded just by importing the entry point
+LAZY_MODULES = {
+    'app': ['pandas', 'networkx', 'matplotlib', 'optimizer_from_db_and_xml', 'variantdf'],
+    'GUI': ['pandas', 'networkx', 'seaborn', 'plotly', 'timeintegration_plotly'],
+}
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def measure(module: str) -> Tuple[float, float, List[Tuple[str, int]]]:
+    """(wall seconds, import seconds, [(direct import, cumulative microseconds)]) for one fresh import"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=here, capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr.strip().splitlines()[-1]}")
+
+    total = 0
+    children: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        # Lines are printed children first, so direct imports precede their top-level parent
+        if indent == 1:
+            if name == module:
+                total = cumulative
+                break
+            # Interpreter startup (site, encodings, .pth hooks) is not charged to the entry point
+            children.clear()
+        elif indent == 3:
+            children[name] = cumulative
+    return wall, total / 1e6, sorted(children.items(), key=lambda item: -item[1])
+
+
+def loaded_modules(module: str) -> List[str]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, '-c', f'import sys, {module}; print(" ".join(sys.modules))'],
+                            cwd=here, capture_output=True, text=True, check=True)
+    return result.stdout.split()
+
+
+def benchmark(module: str, runs: int, top: int) -> bool:
+    samples = [measure(module) for _ in range(runs)]
+    wall = statistics.median(sample[0] for sample in samples)
+    imports = statistics.median(sample[1] for sample in samples)
+    budget = BUDGETS.get(module)
+
+    target = f"; budget {budget * 1000:.0f} ms" if budget else ""
+    print(f"{module}: import {imports * 1000:.0f} ms, process {wall * 1000:.0f} ms (median of {runs}{target})")
+    for name, microseconds in samples[-1][2][:top]:
+        print(f"    {microseconds / 1000:8.1f} ms  {name}")
+
+    ok = budget is None or imports <= budget
+    if not ok:
+        print(f"  over budget by {(imports - budget) * 1000:.0f} ms")
+
+    loaded = set(loaded_modules(module))
+    eager = [name for name in LAZY_MODULES.get(module, []) if name in loaded]
+    if eager:
+        print(f"  loaded eagerly: {', '.join(eager)}")
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=list(BUDGETS))
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help="heaviest direct imports to list")
+    args = parser.parse_args()
+
+    ok = True
+    for module in args.modules:
+        try:
+            ok = benchmark(module, args.runs, args.top) and ok
+        except RuntimeError as e:
+            print(e)
+            ok = False
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
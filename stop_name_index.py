@@ -0,0 +1,160 @@
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Generic, Iterable, List, Optional, Set, Tuple, TypeVar
+
+V = TypeVar('V')
+
+# Letters that NFKD does not decompose into base letter + combining mark
+_EXTRA_FOLDS = str.maketrans({'ł': 'l', 'Ł': 'L', 'ø': 'o', 'Ø': 'O', 'đ': 'd', 'Đ': 'D', 'ß': 'ss'})
+_SEPARATORS_RE = re.compile(r'[\W_]+')
+
+
+def normalize_name(name: str) -> str:
+    """Fold case, diacritics and punctuation: 'Plac Grunwaldzki (Politechnika)' -> 'plac grunwaldzki politechnika'"""
+    decomposed = unicodedata.normalize('NFKD', name.translate(_EXTRA_FOLDS))
+    folded = ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+    return _SEPARATORS_RE.sub(' ', folded).strip()
+
+
+def trigrams(key: str, padded: bool = True) -> Set[str]:
+    """Character trigrams of a normalised key, padded so word edges count"""
+    if padded:
+        key = f"  {key} "
+    return {key[i:i + 3] for i in range(len(key) - 2)}
+
+
+class StopNameIndex(Generic[V]):
+    """Name -> values index with diacritic-folded exact keys and a trigram index.
+
+    Exact lookups are a single dict access; substring and similarity lookups
+    only touch keys sharing the query's trigrams; prefix lookups bisect a
+    sorted list of word-start suffixes. Names that could not be resolved are
+    collected in `unmatched`.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, V]] = ()):
+        self._values: Dict[str, List[V]] = {}
+        self._names: Dict[str, str] = {}
+        self._trigrams: Dict[str, Set[str]] = defaultdict(set)
+        # (key[word_start:], key) for every word of every key, sorted on demand
+        self._word_suffixes: List[Tuple[str, str]] = []
+        self._suffixes_sorted = True
+        self.unmatched: Set[str] = set()
+        for name, value in entries:
+            self.add(name, value)
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, name: str, value: V):
+        key = normalize_name(name)
+        if key not in self._values:
+            self._values[key] = []
+            self._names[key] = name
+            for gram in trigrams(key):
+                self._trigrams[gram].add(key)
+            for match in re.finditer(r'\S+', key):
+                self._word_suffixes.append((key[match.start():], key))
+            self._suffixes_sorted = False
+        self._values[key].append(value)
+
+    def name_for(self, key: str) -> str:
+        """Original spelling of the first name added under a normalised key"""
+        return self._names[key]
+
+    def values_for(self, key: str) -> List[V]:
+        """Values stored under a normalised key, as returned by the search methods"""
+        return self._values.get(key, [])
+
+    def lookup(self, name: str) -> List[V]:
+        """Values stored under exactly this name (after folding)"""
+        return self._values.get(normalize_name(name), [])
+
+    def containing(self, name: str) -> List[str]:
+        """Keys that contain the folded name as a substring, shortest first"""
+        query = normalize_name(name)
+        if not query:
+            return []
+        if len(query) < 3:
+            candidates = self._values.keys()
+        else:
+            grams = sorted(trigrams(query, padded=False), key=lambda gram: len(self._trigrams.get(gram, ())))
+            candidates = set(self._trigrams.get(grams[0], ()))
+            for gram in grams[1:]:
+                candidates &= self._trigrams.get(gram, set())
+                if not candidates:
+                    break
+        return sorted((key for key in candidates if query in key), key=lambda key: (len(key), key))
+
+    def starting_with(self, prefix: str) -> List[str]:
+        """Keys whose whole name starts with the folded prefix, then keys with a later word starting with it"""
+        query = normalize_name(prefix)
+        if not query:
+            return []
+        if not self._suffixes_sorted:
+            self._word_suffixes.sort()
+            self._suffixes_sorted = True
+
+        whole, later = [], []
+        seen = set()
+        start = bisect.bisect_left(self._word_suffixes, (query,))
+        for suffix, key in self._word_suffixes[start:]:
+            if not suffix.startswith(query):
+                break
+            if key not in seen:
+                seen.add(key)
+                (whole if len(suffix) == len(key) else later).append(key)
+        by_length = lambda key: (len(key), key)
+        return sorted(whole, key=by_length) + sorted(later, key=by_length)
+
+    def complete(self, text: str, limit: Optional[int] = 10) -> List[str]:
+        """Autocomplete keys for typed text: name prefix, word prefix, then substring matches"""
+        keys = self.starting_with(text)
+        if limit is None or len(keys) < limit:
+            seen = set(keys)
+            keys += [key for key in self.containing(text) if key not in seen]
+        return keys if limit is None else keys[:limit]
+
+    def similar(self, name: str, threshold: float = 0.8, limit: int = 1) -> List[Tuple[str, float]]:
+        """Keys ranked by trigram Dice similarity to the name, above the threshold"""
+        query_grams = trigrams(normalize_name(name))
+        shared: Dict[str, int] = defaultdict(int)
+        for gram in query_grams:
+            for key in self._trigrams.get(gram, ()):
+                shared[key] += 1
+
+        scored = []
+        for key, count in shared.items():
+            score = 2 * count / (len(query_grams) + len(trigrams(key)))
+            if score >= threshold:
+                scored.append((key, score))
+        scored.sort(key=lambda item: (-item[1], item[0]))
+        return scored[:limit]
+
+    def resolve(self, name: str, substring: bool = True, unique: bool = False,
+                fuzzy: bool = True, threshold: float = 0.8) -> Optional[str]:
+        """Best matching key for a name: exact, then substring, then trigram similarity.
+
+        With unique=True a substring match is only accepted when a single key
+        contains the name.
+        """
+        key = normalize_name(name)
+        if key in self._values:
+            return key
+        if substring:
+            matches = self.containing(name)
+            if matches and (not unique or len(matches) == 1):
+                return matches[0]
+        if fuzzy:
+            matches = self.similar(name, threshold=threshold)
+            if matches:
+                return matches[0][0]
+        self.unmatched.add(name)
+        return None
+
+    def get(self, name: str, **resolve_options) -> List[V]:
+        """Values of the best matching key, or an empty list"""
+        key = self.resolve(name, **resolve_options)
+        return self._values[key] if key is not None else []
@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+
+from db_handler import TramDatabase
+from db_operations import TramDatabaseOperations
+from xml_to_stops_database import initialize_database
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / 'network.db')
+    initialize_database(path)
+    TramDatabase(path).ensure_schema()
+    return path
+
+
+def test_direct_writes_move_the_network_revision(db_file):
+    db = TramDatabase(db_file)
+    conn = sqlite3.connect(db_file)
+    try:
+        for statement in ["INSERT INTO stops (stop_id, stop_name) VALUES ('a', 'A'), ('b', 'B')",
+                          "INSERT INTO tram_lines (line_number) VALUES ('1')",
+                          "INSERT INTO connections (line_number, from_stop, to_stop, weight) VALUES ('1', 'a', 'b', 2)",
+                          "INSERT INTO stop_line_relations (stop_id, line_number) VALUES ('a', '1')",
+                          "UPDATE stops SET stop_name = 'A2' WHERE stop_id = 'a'",
+                          "DELETE FROM stop_line_relations"]:
+            before = db.get_revision('network')
+            conn.execute(statement)
+            conn.commit()
+            if 'tram_lines' not in statement:
+                assert db.get_revision('network') > before, statement
+    finally:
+        conn.close()
+
+
+def test_logged_changes_stay_consecutive(db_file):
+    db = TramDatabase(db_file)
+    ops = TramDatabaseOperations(db_file, events=None)
+    ops.add_stop('a', 'A')
+    since = db.get_revision('network')
+
+    ops.add_stop('b', 'B')
+    ops.add_connection('1', 'a', 'b', 2)
+    ops.delete_stop('b')  # also deletes the connection
+    revision, changes = db.get_network_changes(since)
+    assert revision == since + 3
+    assert [(change['entity'], change['action']) for change in changes] == [
+        ('stop', 'upsert'), ('connection', 'upsert'), ('stop', 'delete')]
+
+    # An unlogged write forces clients behind it to reload
+    conn = sqlite3.connect(db_file)
+    conn.execute("UPDATE stops SET stop_name = 'A2' WHERE stop_id = 'a'")
+    conn.commit()
+    conn.close()
+    assert db.get_network_changes(since)[1] is None
@@ -0,0 +1,87 @@
+import math
+import random
+import time
+
+import pytest
+
+from spatial_index import GridIndex, StopLocator
+
+
+def brute_force(points, x, y, k, max_distance=None, where=None):
+    candidates = sorted(
+        (math.hypot(px - x, py - y), i) for i, (px, py, value) in enumerate(points)
+        if (where is None or where(value)) and (max_distance is None or math.hypot(px - x, py - y) <= max_distance)
+    )
+    return [distance for distance, _ in candidates[:k]]
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = random.Random(7)
+    # A dense cluster plus a few outliers, like a city network with remote terminals
+    points = [(rng.uniform(0, 20_000), rng.uniform(0, 15_000), i) for i in range(400)]
+    points += [(rng.uniform(-5_000, 40_000), rng.uniform(-5_000, 30_000), 400 + i) for i in range(10)]
+    return points
+
+
+QUERIES = [
+    (10_000, 7_500),        # inside
+    (-3_000, 20_000),       # just outside the bounds
+    (300_000, -250_000),    # far away
+    (-1e7, 1e7),            # very far away
+    (1e12, 5),              # absurdly far along one axis
+]
+
+
+@pytest.mark.parametrize('x, y', QUERIES)
+@pytest.mark.parametrize('k', [1, 5, 50])
+def test_nearest_matches_brute_force(points, x, y, k):
+    grid = GridIndex(250.0, points)
+    found = [distance for distance, _ in grid.nearest(x, y, k=k)]
+    assert found == pytest.approx(brute_force(points, x, y, k))
+
+
+@pytest.mark.parametrize('x, y', QUERIES)
+def test_nearest_with_filter_and_max_distance_matches_brute_force(points, x, y):
+    grid = GridIndex(250.0, points)
+    where = lambda value: value % 97 == 0  # noqa: E731
+    found = [distance for distance, _ in grid.nearest(x, y, k=3, where=where)]
+    assert found == pytest.approx(brute_force(points, x, y, 3, where=where))
+
+    limit = 2_000.0
+    found = [distance for distance, _ in grid.nearest(x, y, k=5, max_distance=limit)]
+    assert found == pytest.approx(brute_force(points, x, y, 5, max_distance=limit))
+
+
+def test_far_queries_with_unmatched_filter_stay_fast(points):
+    grid = GridIndex(250.0, points)
+    start = time.perf_counter()
+    for x, y in QUERIES:
+        assert grid.nearest(x, y, k=1, where=lambda value: False) == []
+    assert time.perf_counter() - start < 1.0
+
+
+def test_non_finite_query_is_rejected(points):
+    grid = GridIndex(250.0, points)
+    for x, y in [(math.nan, 0.0), (0.0, math.inf), (-math.inf, math.inf)]:
+        with pytest.raises(ValueError):
+            grid.nearest(x, y)
+
+
+def test_non_finite_box_is_rejected(points):
+    grid = GridIndex(250.0, points)
+    for box in [(math.nan, 0.0, 1.0, 1.0), (0.0, 0.0, math.inf, 1.0), (-math.inf, -math.inf, math.inf, math.inf)]:
+        with pytest.raises(ValueError):
+            grid.within(*box)
+
+
+def test_stop_locator_far_point_and_bounds():
+    stops = [{'id': str(i), 'lat': 51.05 + i * 0.001, 'lng': 16.95 + i * 0.002} for i in range(100)]
+    locator = StopLocator(stops)
+    assert locator.distance_to_bounds(51.1, 17.0) == 0.0
+    assert locator.distance_to_bounds(40.0, 0.0) > 1_000_000
+
+    start = time.perf_counter()
+    distance, stop = locator.nearest(40.0, 0.0, k=1)[0]
+    assert time.perf_counter() - start < 0.5
+    assert stop['id'] == '0'
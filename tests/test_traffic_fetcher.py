@@ -0,0 +1,105 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from traffic_fetcher import AsyncTrafficFetcher
+from xml_to_stops_database import initialize_database
+
+
+def popular_times(percent):
+    return {'status': 'OK', 'result': {'popular_times': [{'data': [percent] * 24} for _ in range(7)]}}
+
+
+class FakeTransport:
+    """Plays back a list of (http_status, body) responses per place_id"""
+
+    def __init__(self, responses):
+        self.responses = {place_id: list(replies) for place_id, replies in responses.items()}
+        self.calls = {place_id: 0 for place_id in responses}
+
+    async def __call__(self, url, params):
+        place_id = params['place_id']
+        self.calls[place_id] += 1
+        return self.responses[place_id].pop(0)
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / 'traffic.db')
+    initialize_database(path)
+    return path
+
+
+def run(db_file, transport, stops, **kwargs):
+    fetcher = AsyncTrafficFetcher('key', db_file, transport=transport, rate=1000.0, backoff=0, **kwargs)
+    return asyncio.run(fetcher.run(stops))
+
+
+def stored_stops(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return dict(conn.execute('SELECT stop_id, COUNT(*) FROM traffic_patterns GROUP BY stop_id').fetchall())
+    finally:
+        conn.close()
+
+
+def test_throttling_and_server_errors_are_retried(db_file):
+    transport = FakeTransport({
+        'p1': [(429, {}), (200, popular_times(10))],
+        'p2': [(503, {}), (500, {}), (200, popular_times(20))],
+        'p3': [(200, {'status': 'OVER_QUERY_LIMIT'}), (200, popular_times(30))],
+    })
+    summary = run(db_file, transport, [('s1', 'p1'), ('s2', 'p2'), ('s3', 'p3')])
+
+    assert summary['fetched'] == 3 and summary['failed'] == 0
+    assert transport.calls == {'p1': 2, 'p2': 3, 'p3': 2}
+    assert stored_stops(db_file) == {'s1': 168, 's2': 168, 's3': 168}
+
+
+def test_retries_are_bounded(db_file):
+    transport = FakeTransport({'p1': [(500, {})] * 3})
+    summary = run(db_file, transport, [('s1', 'p1')], max_retries=2)
+
+    assert summary['failed'] == 1
+    assert transport.calls == {'p1': 3}
+
+
+def test_bad_place_fails_alone(db_file):
+    transport = FakeTransport({
+        'p1': [(200, {'status': 'INVALID_REQUEST'})],
+        'p2': [(200, {'status': 'OK', 'result': {'popular_times': [{'hours': []}]}})],
+        'p3': [(200, popular_times(30))],
+    })
+    summary = run(db_file, transport, [('s1', 'p1'), ('s2', 'p2'), ('s3', 'p3')])
+
+    assert summary['fetched'] == 1 and summary['failed'] == 2
+    # Non-retryable: one call each
+    assert transport.calls == {'p1': 1, 'p2': 1, 'p3': 1}
+    assert stored_stops(db_file) == {'s3': 168}
+
+
+def test_invalid_json_fails_alone(db_file):
+    class BrokenJson(FakeTransport):
+        async def __call__(self, url, params):
+            if params['place_id'] == 'p1':
+                raise ValueError("Expecting value: line 1 column 1 (char 0)")
+            return await super().__call__(url, params)
+
+    summary = run(db_file, BrokenJson({'p1': [], 'p2': [(200, popular_times(5))]}), [('s1', 'p1'), ('s2', 'p2')])
+
+    assert summary['fetched'] == 1 and summary['failed'] == 1
+    assert stored_stops(db_file) == {'s2': 168}
+
+
+def test_results_are_saved_in_batches(db_file):
+    stops = [(f's{i}', f'p{i}') for i in range(5)]
+    transport = FakeTransport({place_id: [(200, popular_times(i))] for i, (_, place_id) in enumerate(stops)})
+    summary = run(db_file, transport, stops, batch_size=2)
+
+    assert summary == {'fetched': 5, 'failed': 0, 'upserted': 5 * 168, 'deleted': 0}
+    assert stored_stops(db_file) == {stop_id: 168 for stop_id, _ in stops}
+
+    # Same data again: nothing to write
+    transport = FakeTransport({place_id: [(200, popular_times(i))] for i, (_, place_id) in enumerate(stops)})
+    assert run(db_file, transport, stops, batch_size=2)['upserted'] == 0
@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+from db_handler import TramDatabase
+from traffic_import import apply_traffic_rows
+from xml_to_stops_database import initialize_database
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    path = str(tmp_path / 'traffic.db')
+    initialize_database(path)
+    TramDatabase(path).ensure_schema()
+    return path
+
+
+def rows_for(stop_id, percent):
+    return {(stop_id, day, f"{hour:02d}:00"): float(percent)
+            for day in ('Monday', 'Tuesday') for hour in range(24)}
+
+
+def test_one_revision_per_apply(db_file):
+    db = TramDatabase(db_file)
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        before = db.get_revision('traffic')
+        assert apply_traffic_rows(conn, rows_for('a', 10))['upserted'] == 48
+        assert db.get_revision('traffic') == before + 1
+
+        # Nothing changed: no new revision
+        assert apply_traffic_rows(conn, rows_for('a', 10))['unchanged'] == 48
+        assert db.get_revision('traffic') == before + 1
+
+        result = apply_traffic_rows(conn, rows_for('b', 20))
+        assert result == {'upserted': 48, 'deleted': 48, 'unchanged': 0}
+        assert db.get_revision('traffic') == before + 2
+        assert conn.execute('SELECT COUNT(*) FROM revision_guards').fetchone()[0] == 0
+
+        # Other writers are still counted by the triggers
+        conn.execute("UPDATE traffic_patterns SET congestion_percent = 0 WHERE stop_id = 'b' AND hour = '00:00'")
+        assert db.get_revision('traffic') == before + 4
+    finally:
+        conn.close()
+
+
+def test_open_transaction_is_not_committed(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("INSERT INTO stops (stop_id, stop_name) VALUES ('a', 'A')")
+        with pytest.raises(sqlite3.ProgrammingError):
+            apply_traffic_rows(conn, rows_for('a', 10))
+        conn.rollback()
+        assert conn.execute('SELECT COUNT(*) FROM stops').fetchone()[0] == 0
+        assert conn.execute('SELECT COUNT(*) FROM traffic_patterns').fetchone()[0] == 0
+    finally:
+        conn.close()
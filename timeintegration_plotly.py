@@ -1,105 +1,91 @@
+"""Plotly map of the tram network coloured by traffic.
+
+generate_live() shows the current hour; generate_week() precomputes all
+7 x 24 hours as animation frames in one self-contained HTML file:
+
+    python timeintegration_plotly.py [traffic_week.html]
+
+Stops are one WebGL marker trace and connections one line trace per width
+(None-separated segments), so a frame only swaps the stop colours and
+intensities.
+"""
+import sys
+from typing import List
+
 from tram_stops_and_their_lines import get_lines
-def generate_live():
-    import json
-    from datetime import datetime
-    import plotly.graph_objects as go
+from traffic_network import ColorLUT, TrafficNetwork, load_traffic_network
+from traffic_store import DAYS, HOURS
+
+HOVER_TEMPLATE = "Przystanek: %{text}<br>Natężenie ruchu: %{customdata}% <br>Linie: %{hovertext}<extra></extra>"
+
+
+def map_day_to_polish(day):
+    days_map = {
+        "monday": "Monday",
+        "tuesday": "Tuesday",
+        "wednesday": "Wednesday",
+        "thursday": "Thursday",
+        "friday": "Friday",
+        "saturday": "Saturday",
+        "sunday": "Sunday"
+    }
+    return days_map.get(day.lower(), "")
+
+
+def traffic_colors() -> ColorLUT:
     import plotly.express as px
-    get_lines()
-    def percentage_to_color(percentage):
-        cmap = px.colors.sequential.Inferno[::-1]
-        norm_percentage = int((percentage / 100) * (len(cmap) - 1))
-        return cmap[norm_percentage]
-
-    def get_traffic_intensity(day, time, location_data):
-        for day_data in location_data['traffic_data']:
-            if day_data[0].lower() == day.lower():
-                for hour_data in day_data[1]:
-                    if hour_data.startswith(time):
-                        intensity = hour_data.split(": ")[1]
-                        return int(intensity.strip('%.'))
-        return 0
-
-    def map_day_to_polish(day):
-        days_map = {
-            "monday": "Monday",
-            "tuesday": "Tuesday",
-            "wednesday": "Wednesday",
-            "thursday": "Thursday",
-            "friday": "Friday",
-            "saturday": "Saturday",
-            "sunday": "Sunday"
-        }
-        return days_map.get(day.lower(), "")
-
-    with open('traffic_data.json', 'r', encoding='utf-8') as file:
-        traffic_info = json.load(file)
-
-    with open('archive/sequential_edges.json', 'r', encoding='utf-8') as file:
-        nodes_data = json.load(file)
+    return ColorLUT.from_colors(px.colors.sequential.Inferno[::-1])
 
-    now = datetime.now()
-    current_day = map_day_to_polish(now.strftime('%A'))
-    current_hour = now.strftime('%H:00') 
-
-    node_colors = {}
-    node_intensities = {}
-    node_coords = {}
-    edges = []
-    with open('archive/stop_to_lines.json', 'r', encoding='utf-8') as file:
-        line_info = json.load(file)
-    for route_id, connections in nodes_data.items():
-        for connection in connections:
-            from_node = connection['from']
-            to_node = connection['to']
-            
-            from_traffic_intensity = 0
-            to_traffic_intensity = 0
-            
-            for location_data in traffic_info:
-                if from_node.lower() in location_data['location'].lower():
-                    from_traffic_intensity = get_traffic_intensity(current_day, current_hour, location_data)
-                    node_coords[from_node] = location_data['coordinates']
-                if to_node.lower() in location_data['location'].lower():
-                    to_traffic_intensity = get_traffic_intensity(current_day, current_hour, location_data)
-                    node_coords[to_node] = location_data['coordinates']
-            
-            from_color = percentage_to_color(from_traffic_intensity)
-            to_color = percentage_to_color(to_traffic_intensity)
-            
-            node_colors[from_node] = from_color
-            node_colors[to_node] = to_color
-            node_intensities[from_node] = from_traffic_intensity
-            node_intensities[to_node] = to_traffic_intensity
-            edges.append((from_node, to_node, connection['weight']))
-
-    fig = go.Figure()
-
-    for node, coords in node_coords.items():
-        lines = ', '.join(line_info[node])
-        fig.add_trace(go.Scatter(
-            x=[coords[1]],  # Using longitude as x
-            y=[coords[0]],  # Using latitude as y
-            text=f"{node}",
-            marker=dict(color=node_colors[node], size=10),
-            mode='markers+text',
-            textposition="top center",
-            hovertext=f"Przystanek: {node}<br>Natężenie ruchu: {node_intensities[node]}% <br>Linie: {lines}",
-            hoverinfo="text",
-            name=node
-        ))
 
-    for from_node, to_node, weight in edges:
-        fig.add_trace(go.Scatter(
-            x=[node_coords[from_node][1], node_coords[to_node][1]],
-            y=[node_coords[from_node][0], node_coords[to_node][0]],
-            mode='lines',
-            line=dict(width=weight, color='black'),
-            opacity=0.6,
-            name=f"{from_node} to {to_node}"
-        ))
+def title_for(weekday: int, hour: int) -> str:
+    return f"Natężenie ruchu w dniu {map_day_to_polish(DAYS[weekday]).capitalize()} o godzinie {hour:02d}:00"
+
 
+def edge_traces(network: TrafficNetwork) -> List:
+    """One line trace per connection width, segments separated by None"""
+    import numpy as np
+    import plotly.graph_objects as go
+
+    located = ~np.isnan(network.coords).any(axis=1)
+    traces = []
+    for weight in np.unique(network.weights).tolist():
+        x, y = [], []
+        for u, v in network.edges[network.weights == weight].tolist():
+            if located[u] and located[v]:
+                x += [network.coords[u, 1], network.coords[v, 1], None]
+                y += [network.coords[u, 0], network.coords[v, 0], None]
+        traces.append(go.Scattergl(x=x, y=y, mode='lines', line=dict(width=weight, color='black'),
+                                   opacity=0.6, hoverinfo='skip', name=f"weight {weight:g}"))
+    return traces
+
+
+def stop_trace(network: TrafficNetwork, lut: ColorLUT, weekday: int, hour: int):
+    """All stops with coordinates as one WebGL marker trace"""
+    import numpy as np
+    import plotly.graph_objects as go
+
+    located = np.flatnonzero(~np.isnan(network.coords).any(axis=1))
+    intensities = network.intensities(weekday, hour)[located]
+    return go.Scattergl(
+        x=network.coords[located, 1],  # Using longitude as x
+        y=network.coords[located, 0],  # Using latitude as y
+        text=[network.nodes[i] for i in located.tolist()],
+        hovertext=[', '.join(network.lines_of(network.nodes[i])) for i in located.tolist()],
+        customdata=intensities,
+        hovertemplate=HOVER_TEMPLATE,
+        marker=dict(color=lut.hex_for(intensities), size=10),
+        mode='markers+text',
+        textposition="top center",
+        name="stops"
+    )
+
+
+def network_figure(network: TrafficNetwork, lut: ColorLUT, weekday: int, hour: int):
+    import plotly.graph_objects as go
+
+    fig = go.Figure(data=edge_traces(network) + [stop_trace(network, lut, weekday, hour)])
     fig.update_layout(
-        title=f"Natężenie ruchu w dniu {current_day.capitalize()} o godzinie {current_hour}",
+        title=title_for(weekday, hour),
         xaxis_title="Długość geograficzna",
         yaxis_title="Szerokość geograficzna",
         showlegend=False,
@@ -107,5 +93,51 @@ def generate_live():
         yaxis=dict(showgrid=False, zeroline=False),
         plot_bgcolor='white'
     )
+    return fig
+
+
+def generate_live():
+    from datetime import datetime
+    now = datetime.now()
+    network_figure(load_traffic_network(lines=get_lines()), traffic_colors(), now.weekday(), now.hour).show()
+
+
+def generate_week(path: str = 'traffic_week.html', frame_ms: int = 300) -> str:
+    """Write every hour of the week as animation frames with a slider to one HTML file"""
+    import plotly.graph_objects as go
+    network = load_traffic_network(lines=get_lines())
+    lut = traffic_colors()
+    fig = network_figure(network, lut, 0, 0)
+    stop_index = len(fig.data) - 1
+
+    # Frames only carry what changes: stop colours, intensities and the title
+    hours = [(weekday, hour) for weekday in range(len(DAYS)) for hour in range(HOURS)]
+    frames = []
+    for weekday, hour in hours:
+        trace = stop_trace(network, lut, weekday, hour)
+        frames.append(go.Frame(
+            name=f"{weekday}_{hour:02d}",
+            data=[go.Scattergl(marker=dict(color=trace.marker.color), customdata=trace.customdata)],
+            traces=[stop_index],
+            layout=dict(title_text=title_for(weekday, hour))
+        ))
+    fig.frames = frames
+
+    step_options = dict(mode='immediate', frame=dict(duration=frame_ms, redraw=True), transition=dict(duration=0))
+    fig.update_layout(
+        updatemenus=[dict(type='buttons', direction='left', x=0, y=-0.08, xanchor='left', yanchor='top', buttons=[
+            dict(label="▶", method='animate', args=[None, dict(step_options, fromcurrent=True)]),
+            dict(label="❚❚", method='animate', args=[[None], dict(step_options, frame=dict(duration=0))]),
+        ])],
+        sliders=[dict(x=0.1, len=0.9, y=-0.05, currentvalue=dict(prefix=""), steps=[
+            dict(label=f"{map_day_to_polish(DAYS[weekday])[:3]} {hour:02d}:00", method='animate',
+                 args=[[f"{weekday}_{hour:02d}"], step_options])
+            for weekday, hour in hours
+        ])]
+    )
+    fig.write_html(path, include_plotlyjs=True, auto_play=False)
+    return path
+
 
-    fig.show()
+if __name__ == '__main__':
+    print(f"Wrote {generate_week(*sys.argv[1:2])}")
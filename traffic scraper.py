@@ -1,8 +1,13 @@
+import asyncio
 import requests
 import sqlite3
 from datetime import datetime
 import time
 
+from db_handler import TramDatabase
+from traffic_fetcher import AsyncTrafficFetcher, parse_popular_times
+from traffic_import import apply_traffic_rows
+
 
 class GooglePlacesTraffic:
     def __init__(self, api_key, db_file='tram_data.db'):
@@ -33,66 +38,39 @@ class GooglePlacesTraffic:
 
     def _parse_response(self, api_data):
         """Structure data to match your database schema"""
-        popular_times = []
-        days_map = ["Monday", "Tuesday", "Wednesday",
-                    "Thursday", "Friday", "Saturday", "Sunday"]
-
-        if 'popular_times' in api_data.get('result', {}):
-            for day_idx, day_data in enumerate(api_data['result']['popular_times']):
-                day_name = days_map[day_idx]
-                hours = []
-
-                for hour_idx, busy_percent in enumerate(day_data['data']):
-                    hours.append({
-                        "hour": f"{hour_idx:02d}:00",
-                        "congestion_percent": busy_percent
-                    })
-
-                popular_times.append({
-                    "day_of_week": day_name,
-                    "hours": hours
-                })
-
-        return popular_times
+        return parse_popular_times(api_data)
 
     def save_to_database(self, place_id, stop_id, data):
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
+        TramDatabase(self.db_file).ensure_schema()
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
 
         try:
-            cursor.execute("DELETE FROM traffic_patterns WHERE stop_id = ?", (stop_id,))
-
-            for day in data:
-                for hour in day["hours"]:
-                    cursor.execute('''
-                        INSERT INTO traffic_patterns 
-                        (stop_id, day_of_week, hour, congestion_percent)
-                        VALUES (?, ?, ?, ?)
-                    ''', (stop_id, day["day_of_week"], hour["hour"], hour["congestion_percent"]))
-
-            conn.commit()
+            rows = {
+                (stop_id, day["day_of_week"], hour["hour"]): float(hour["congestion_percent"])
+                for day in data
+                for hour in day["hours"]
+            }
+            # Only this stop's rows are compared, changed ones are upserted in one transaction
+            apply_traffic_rows(conn, rows, scope_stop_ids=[stop_id])
             print(f"Saved data for {place_id}")
         except Exception as e:
             print(f"Database error: {e}")
         finally:
             conn.close()
 
-    def process_all_stops(self):
-        conn = sqlite3.connect(self.db_file)
-        cursor = conn.cursor()
-
-        # Get stops with their Google Place IDs (you'll need to store these)
-        cursor.execute('''
-            SELECT stop_id, place_id FROM stops 
-            WHERE place_id IS NOT NULL
-        ''')
-
-        for stop_id, place_id in cursor.fetchall():
-            print(f"Processing {place_id}...")
-            data = self.get_popular_times(place_id)
-            if data:
-                self.save_to_database(place_id, stop_id, data)
-            time.sleep(0.5)  # Respect API rate limits
+    def process_all_stops(self, rate=10.0, concurrency=8, **fetcher_options):
+        """Refresh every stop that has a Google Place ID (you'll need to store these).
+
+        Requests run concurrently under a token-bucket rate limit and results are
+        written to the database in batches.
+        """
+        fetcher = AsyncTrafficFetcher(self.api_key, self.db_file, base_url=self.base_url,
+                                      rate=rate, concurrency=concurrency, **fetcher_options)
+        started = time.monotonic()
+        summary = asyncio.run(fetcher.process_all_stops())
+        print(f"Fetched {summary['fetched']} places ({summary['failed']} failed), "
+              f"{summary['upserted']} rows updated in {time.monotonic() - started:.1f}s")
+        return summary
 
 
 if __name__ == "__main__":
@@ -0,0 +1,206 @@
+import asyncio
+import random
+import sqlite3
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from db_handler import TramDatabase
+from traffic_import import apply_traffic_rows
+
+PLACES_DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
+DAYS_MAP = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# API statuses worth retrying; anything else (e.g. INVALID_REQUEST) fails immediately
+RETRYABLE_STATUSES = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+
+# transport(url, params) -> (http_status, json_body)
+Transport = Callable[[str, Dict], Awaitable[Tuple[int, Dict]]]
+
+
+class RetryableError(Exception):
+    pass
+
+
+# Failures worth retrying: throttling and server errors, transport errors and timeouts
+# (requests' exceptions and TimeoutError are OSErrors). Anything else, e.g. a malformed
+# response (ValueError, including requests' JSONDecodeError), fails that place at once.
+TRANSIENT_ERRORS = (RetryableError, OSError)
+
+
+def parse_popular_times(api_data: Dict) -> List[Dict]:
+    """Structure a Place Details response to match the traffic_patterns schema"""
+    popular_times = []
+    for day_idx, day_data in enumerate(api_data.get('result', {}).get('popular_times', [])):
+        popular_times.append({
+            "day_of_week": DAYS_MAP[day_idx],
+            "hours": [{"hour": f"{hour_idx:02d}:00", "congestion_percent": busy_percent}
+                      for hour_idx, busy_percent in enumerate(day_data['data'])]
+        })
+    return popular_times
+
+
+class RequestsTransport:
+    """Default transport: blocking requests calls run in worker threads"""
+
+    def __init__(self, timeout: float = 10):
+        import requests
+        self.session = requests.Session()
+        self.timeout = timeout
+
+    async def __call__(self, url: str, params: Dict) -> Tuple[int, Dict]:
+        response = await asyncio.to_thread(self.session.get, url, params=params, timeout=self.timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            # Error pages are often not JSON; the status alone decides the retry
+            return response.status_code, {}
+        return response.status_code, response.json()
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second with bursts up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncTrafficFetcher:
+    """Fetch popular times for many places concurrently and save them in batches"""
+
+    def __init__(self, api_key, db_file='tram_data.db', transport: Optional[Transport] = None,
+                 base_url: str = PLACES_DETAILS_URL, rate: float = 10.0, burst: Optional[float] = None,
+                 concurrency: int = 8, max_retries: int = 3, backoff: float = 0.5, batch_size: int = 50):
+        self.api_key = api_key
+        self.db_file = db_file
+        self.transport = transport
+        self.base_url = base_url
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.batch_size = batch_size
+
+    async def _request(self, place_id: str) -> Dict:
+        params = {
+            "place_id": place_id,
+            "fields": "utc_offset,current_opening_hours,popular_times",
+            "key": self.api_key
+        }
+        status_code, data = await self.transport(self.base_url, params)
+        if status_code == 429 or status_code >= 500:
+            raise RetryableError(f"HTTP {status_code}")
+        if data.get('status') in RETRYABLE_STATUSES:
+            raise RetryableError(data.get('status'))
+        return data
+
+    async def fetch_place(self, place_id: str, bucket: TokenBucket, semaphore: asyncio.Semaphore) -> Optional[List[Dict]]:
+        """Fetch one place, retrying transient failures with exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            async with semaphore:
+                await bucket.acquire()
+                try:
+                    data = await self._request(place_id)
+                except ValueError as e:
+                    print(f"Invalid response for {place_id}: {e}")
+                    return None
+                except TRANSIENT_ERRORS as e:
+                    error = e
+                except Exception as e:
+                    print(f"Request failed for {place_id}: {e!r}")
+                    return None
+                else:
+                    if data.get('status') != 'OK':
+                        print(f"API Error for {place_id}: {data.get('error_message', data.get('status', 'Unknown error'))}")
+                        return None
+                    try:
+                        return parse_popular_times(data)
+                    except (KeyError, TypeError, ValueError, IndexError, AttributeError) as e:
+                        print(f"Invalid popular times for {place_id}: {e!r}")
+                        return None
+
+            if attempt < self.max_retries:
+                # Sleep outside the semaphore so other places can use the slot
+                await asyncio.sleep(self.backoff * (2 ** attempt) * (1 + random.random()))
+
+        print(f"Request failed for {place_id}: {error}")
+        return None
+
+    def _save_batch(self, conn: sqlite3.Connection, batch: List[Tuple[str, List[Dict]]]) -> Dict[str, int]:
+        rows = {
+            (stop_id, day["day_of_week"], hour["hour"]): float(hour["congestion_percent"])
+            for stop_id, data in batch
+            for day in data
+            for hour in day["hours"]
+        }
+        return apply_traffic_rows(conn, rows, scope_stop_ids=[stop_id for stop_id, _ in batch])
+
+    async def run(self, stops: Sequence[Tuple[str, str]]) -> Dict[str, int]:
+        """Fetch and save traffic for (stop_id, place_id) pairs, returning summary counts"""
+        if self.transport is None:
+            self.transport = RequestsTransport()
+
+        TramDatabase(self.db_file).ensure_schema()
+        bucket = TokenBucket(self.rate, self.burst)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        conn = sqlite3.connect(self.db_file, isolation_level=None, check_same_thread=False)
+        summary = {'fetched': 0, 'failed': 0, 'upserted': 0, 'deleted': 0}
+        batch: List[Tuple[str, List[Dict]]] = []
+
+        async def flush():
+            if batch:
+                result = await asyncio.to_thread(self._save_batch, conn, list(batch))
+                summary['upserted'] += result['upserted']
+                summary['deleted'] += result['deleted']
+                batch.clear()
+
+        async def fetch(stop_id, place_id):
+            return stop_id, await self.fetch_place(place_id, bucket, semaphore)
+
+        tasks = []
+        try:
+            tasks = [asyncio.create_task(fetch(stop_id, place_id)) for stop_id, place_id in stops]
+            for task in asyncio.as_completed(tasks):
+                stop_id, data = await task
+                if data:
+                    summary['fetched'] += 1
+                    batch.append((stop_id, data))
+                    if len(batch) >= self.batch_size:
+                        await flush()
+                else:
+                    summary['failed'] += 1
+            await flush()
+        finally:
+            # A parse or save error leaves other fetches pending; stop them before the connection goes
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            conn.close()
+        return summary
+
+    def load_stops(self) -> List[Tuple[str, str]]:
+        """Get stops with their Google Place IDs"""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            return conn.execute('''
+                SELECT stop_id, place_id FROM stops
+                WHERE place_id IS NOT NULL
+            ''').fetchall()
+        finally:
+            conn.close()
+
+    async def process_all_stops(self) -> Dict[str, int]:
+        return await self.run(self.load_stops())
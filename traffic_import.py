@@ -0,0 +1,186 @@
+import json
+import re
+import sqlite3
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from db_handler import TramDatabase
+from stop_name_index import StopNameIndex
+
+# (stop_id, day_of_week, hour) -> congestion_percent
+TrafficRows = Dict[Tuple[str, str, str], float]
+
+# Polish to English day mapping
+DAY_TRANSLATION = {
+    "poniedziałek": "Monday",
+    "wtorek": "Tuesday",
+    "środa": "Wednesday",
+    "czwartek": "Thursday",
+    "piątek": "Friday",
+    "sobota": "Saturday",
+    "niedziela": "Sunday"
+}
+
+# Matches entries like "08:00: 12%."
+HOUR_PERCENT_RE = re.compile(r"(\d{2}):\d{2}:\s*(\d+)%")
+
+UPSERT_QUERY = '''
+INSERT INTO traffic_patterns (stop_id, day_of_week, hour, congestion_percent)
+VALUES (?, ?, ?, ?)
+ON CONFLICT (stop_id, day_of_week, hour) DO UPDATE SET congestion_percent = excluded.congestion_percent
+'''
+
+DELETE_QUERY = '''
+DELETE FROM traffic_patterns WHERE stop_id = ? AND day_of_week = ? AND hour = ?
+'''
+
+
+def iter_traffic_entries(json_path: str, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """Yield the location entries of a traffic JSON array one at a time, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    with open(json_path, 'r', encoding='utf-8') as file:
+        buffer = ''
+        pos = 0
+        in_array = False
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+
+            if pos < len(buffer):
+                if not in_array:
+                    if buffer[pos] != '[':
+                        raise ValueError(f"{json_path} does not contain a JSON array")
+                    in_array = True
+                    pos += 1
+                    continue
+                if buffer[pos] == ']':
+                    return
+                try:
+                    entry, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Entry spans the chunk boundary, read more below
+                    if eof:
+                        raise
+                else:
+                    pos = end
+                    yield entry
+                    continue
+
+            if eof:
+                raise ValueError(f"Unexpected end of {json_path}")
+
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def parse_hour_and_percent(entry_str: str) -> Tuple[Optional[str], Optional[float]]:
+    """Extract hour and percent from "08:00: 12%." """
+    match = HOUR_PERCENT_RE.match(entry_str)
+    if match:
+        return match.group(1), float(match.group(2))
+    return None, None
+
+
+def build_traffic_rows(entries: Iterable[dict], stop_index: StopNameIndex) -> TrafficRows:
+    """Turn traffic JSON entries into traffic_patterns rows keyed by (stop_id, day, hour).
+
+    Locations are joined to stops on diacritic-folded names, falling back to a
+    stop name that uniquely contains the location; unresolved names end up in
+    stop_index.unmatched.
+    """
+    rows: TrafficRows = {}
+    for entry in entries:
+        stop_ids = stop_index.get(entry["location"], unique=True, fuzzy=False)
+        if not stop_ids:
+            continue
+
+        for day_polish, hourly_entries in entry.get("traffic_data", []):
+            day_english = DAY_TRANSLATION.get(day_polish.lower())
+            if not day_english:
+                continue
+
+            for line in hourly_entries:
+                hour, percent = parse_hour_and_percent(line)
+                if hour is None:
+                    continue
+                for stop_id in stop_ids:
+                    # First entry wins, as with the previous INSERT OR IGNORE
+                    rows.setdefault((stop_id, day_english, hour), percent)
+    return rows
+
+
+def _load_current_rows(cursor: sqlite3.Cursor, scope_stop_ids: Optional[Iterable[str]]) -> TrafficRows:
+    """Read the current traffic_patterns rows, optionally only for some stops"""
+    query = 'SELECT stop_id, day_of_week, hour, congestion_percent FROM traffic_patterns'
+    if scope_stop_ids is None:
+        cursor.execute(query)
+        return {(stop_id, day, hour): percent for stop_id, day, hour, percent in cursor.fetchall()}
+
+    current: TrafficRows = {}
+    for stop_id in set(scope_stop_ids):
+        cursor.execute(query + ' WHERE stop_id = ?', (stop_id,))
+        current.update({(s, day, hour): percent for s, day, hour, percent in cursor.fetchall()})
+    return current
+
+
+def apply_traffic_rows(conn: sqlite3.Connection, rows: TrafficRows,
+                       scope_stop_ids: Optional[Iterable[str]] = None,
+                       prune: bool = True) -> Dict[str, int]:
+    """Write only changed traffic rows in a single transaction.
+
+    scope_stop_ids limits the comparison (and pruning of rows missing from
+    `rows`) to those stops; None compares against the whole table. The
+    connection must be in autocommit mode (isolation_level=None) with no
+    transaction open, and its database must have the TramDatabase schema
+    extensions. The traffic revision moves once per call that changes rows.
+    """
+    if conn.in_transaction:
+        raise sqlite3.ProgrammingError("apply_traffic_rows needs a connection with no open transaction")
+    cursor = conn.cursor()
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+        current = _load_current_rows(cursor, scope_stop_ids)
+
+        upserts = [(stop_id, day, hour, percent)
+                   for (stop_id, day, hour), percent in rows.items()
+                   if current.get((stop_id, day, hour)) != percent]
+        deletes = [key for key in current if key not in rows] if prune else []
+
+        if upserts or deletes:
+            # Skip the per-row revision triggers and bump once for the whole batch
+            cursor.execute("INSERT INTO revision_guards (name) VALUES ('traffic')")
+            if upserts:
+                cursor.executemany(UPSERT_QUERY, upserts)
+            if deletes:
+                cursor.executemany(DELETE_QUERY, deletes)
+            cursor.execute("DELETE FROM revision_guards WHERE name = 'traffic'")
+            cursor.execute("UPDATE data_revisions SET revision = revision + 1 WHERE name = 'traffic'")
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+
+    return {
+        'upserted': len(upserts),
+        'deleted': len(deletes),
+        'unchanged': len(rows) - len(upserts)
+    }
+
+
+def import_traffic_file(json_path: str = 'traffic_data.json', db_file: str = 'tram_data2.db') -> Dict:
+    """Synchronise traffic_patterns with a traffic JSON file, touching only rows that changed"""
+    TramDatabase(db_file).ensure_schema()
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        # Folded stop name → list of stop_ids
+        stop_index = StopNameIndex(conn.execute("SELECT stop_name, stop_id FROM stops"))
+
+        rows = build_traffic_rows(iter_traffic_entries(json_path), stop_index)
+        result = apply_traffic_rows(conn, rows)
+    finally:
+        conn.close()
+
+    result['missing_stops'] = sorted(stop_index.unmatched)
+    return result
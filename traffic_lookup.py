@@ -0,0 +1,75 @@
+import json
+import os
+from typing import Dict, List, Optional
+
+from traffic_import import DAY_TRANSLATION, iter_traffic_entries, parse_hour_and_percent
+from traffic_store import DAYS, HOURS
+
+CACHE_VERSION = 1
+
+# Polish and English day names -> weekday index (Monday = 0, as datetime.weekday())
+WEEKDAY_INDEX = {day.lower(): i for i, day in enumerate(DAYS)}
+WEEKDAY_INDEX.update({polish: WEEKDAY_INDEX[english.lower()] for polish, english in DAY_TRANSLATION.items()})
+
+
+class TrafficLookup:
+    """Parsed traffic_data.json: location -> 7 x 24 integer intensities plus coordinates"""
+
+    def __init__(self, traffic: Dict[str, List[List[int]]], coordinates: Dict[str, List[float]]):
+        self.traffic = traffic
+        self.coordinates = coordinates
+
+    @property
+    def locations(self) -> List[str]:
+        return list(self.traffic)
+
+    def intensity(self, location: str, weekday: int, hour: int) -> int:
+        """Traffic percent at a location for a weekday (Monday = 0) and hour, 0 if unknown"""
+        days = self.traffic.get(location)
+        return days[weekday][hour] if days else 0
+
+    def for_location(self, location: str) -> Optional[List[List[int]]]:
+        return self.traffic.get(location)
+
+    @classmethod
+    def from_entries(cls, entries) -> 'TrafficLookup':
+        traffic = {}
+        coordinates = {}
+        for entry in entries:
+            days = [[0] * HOURS for _ in DAYS]
+            for day_name, hourly_entries in entry.get('traffic_data', []):
+                weekday = WEEKDAY_INDEX.get(day_name.lower())
+                if weekday is None:
+                    continue
+                for line in hourly_entries:
+                    hour, percent = parse_hour_and_percent(line)
+                    if hour is not None and int(hour) < HOURS:
+                        days[weekday][int(hour)] = int(percent)
+            traffic[entry['location']] = days
+            coordinates[entry['location']] = entry.get('coordinates')
+        return cls(traffic, coordinates)
+
+    @classmethod
+    def load(cls, json_path: str = 'traffic_data.json', cache_path: Optional[str] = None) -> 'TrafficLookup':
+        """Load the lookup from its disk cache, rebuilding it when the source file changed"""
+        if cache_path is None:
+            cache_path = os.path.splitext(json_path)[0] + '.lookup.json'
+
+        source = os.stat(json_path)
+        signature = [CACHE_VERSION, source.st_mtime_ns, source.st_size]
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as file:
+                cached = json.load(file)
+            if cached.get('signature') == signature:
+                return cls(cached['traffic'], cached['coordinates'])
+        except (OSError, ValueError, KeyError):
+            pass
+
+        lookup = cls.from_entries(iter_traffic_entries(json_path))
+        try:
+            with open(cache_path, 'w', encoding='utf-8') as file:
+                json.dump({'signature': signature, 'traffic': lookup.traffic,
+                           'coordinates': lookup.coordinates}, file, ensure_ascii=False, separators=(',', ':'))
+        except OSError as e:
+            print(f"Could not write traffic lookup cache {cache_path}: {e}")
+        return lookup
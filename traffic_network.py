@@ -0,0 +1,289 @@
+"""Traffic-coloured network rendering shared by the timeintegration scripts.
+
+TrafficNetwork loads the stop sequence graph, the per-stop weekly traffic
+and the stop -> lines mapping once into arrays, so a day/hour is one
+column slice. ColorLUT maps whole intensity arrays to colours by table
+lookup instead of calling the colormap per stop. TrafficNetworkRenderer
+builds the matplotlib artists once and only recolours them per frame.
+"""
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from stop_name_index import StopNameIndex
+from traffic_lookup import TrafficLookup
+from traffic_store import DAYS, HOURS
+
+TRAFFIC_FILE = 'traffic_data.json'
+EDGES_FILE = 'archive/sequential_edges.json'
+LINES_FILE = 'archive/stop_to_lines.json'
+
+
+class ColorLUT:
+    """Colours for every whole traffic percent 0-100, looked up for whole arrays at once"""
+
+    def __init__(self, rgba: np.ndarray):
+        self.rgba = rgba
+        self.hex = np.array(['#%02x%02x%02x' % tuple(rgb) for rgb in np.round(rgba[:, :3] * 255).astype(int)])
+
+    @classmethod
+    def from_cmap(cls, name: str = 'coolwarm') -> 'ColorLUT':
+        """Sample a matplotlib colormap, as plt.get_cmap(name)(Normalize(0, 100)(percent))"""
+        import matplotlib
+
+        return cls(matplotlib.colormaps[name](np.arange(101) / 100))
+
+    @classmethod
+    def from_colors(cls, colors: Sequence[str]) -> 'ColorLUT':
+        """Discrete scale (e.g. plotly's): percent p gets colors[int(p / 100 * (len(colors) - 1))]"""
+        from matplotlib.colors import to_rgba_array
+
+        steps = (np.arange(101) / 100 * (len(colors) - 1)).astype(int)
+        return cls(to_rgba_array([_css_color(color) for color in colors])[steps])
+
+    def _indices(self, percent) -> np.ndarray:
+        return np.clip(np.rint(np.asarray(percent, dtype=float)), 0, 100).astype(int)
+
+    def rgba_for(self, percent) -> np.ndarray:
+        return self.rgba[self._indices(percent)]
+
+    def hex_for(self, percent) -> np.ndarray:
+        return self.hex[self._indices(percent)]
+
+
+def _css_color(color: str) -> str:
+    """matplotlib understands hex and names; plotly scales may also use 'rgb(r, g, b)'"""
+    if color.startswith('rgb'):
+        r, g, b = (int(float(part)) for part in color[color.index('(') + 1:color.index(')')].split(',')[:3])
+        return f'#{r:02x}{g:02x}{b:02x}'
+    return color
+
+
+class TrafficNetwork:
+    """Stops, connections, coordinates, lines and a stops x days x hours intensity cube.
+
+    Stops are named as in the sequential edges file; each is matched once to
+    a traffic location. Stops without traffic data have intensity 0 and NaN
+    coordinates.
+    """
+
+    def __init__(self, nodes: List[str], edges: np.ndarray, weights: np.ndarray, intensity: np.ndarray,
+                 coords: np.ndarray, lines: Dict[str, List[str]], unmatched: Iterable[str] = ()):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.edges = edges
+        self.weights = weights
+        self.intensity = intensity
+        self.coords = coords
+        self.lines = lines
+        self.unmatched = sorted(unmatched)
+
+    @classmethod
+    def from_files(cls, traffic_file: str = TRAFFIC_FILE, edges_file: str = EDGES_FILE,
+                   lines_file: Optional[str] = LINES_FILE,
+                   lines: Optional[Dict[str, List[str]]] = None) -> 'TrafficNetwork':
+        """Load from the traffic and edges files; lines, if given, is used instead of lines_file"""
+        traffic_lookup = TrafficLookup.load(traffic_file)
+        with open(edges_file, 'r', encoding='utf-8') as file:
+            routes = json.load(file)
+        if lines is None:
+            lines = {}
+            if lines_file is not None:
+                with open(lines_file, 'r', encoding='utf-8') as file:
+                    lines = json.load(file)
+
+        # Stops in order of first appearance; a repeated connection keeps its last weight
+        index: Dict[str, int] = {}
+        connections: Dict[Tuple[int, int], float] = {}
+        for connections_of_route in routes.values():
+            for connection in connections_of_route:
+                u = index.setdefault(connection['from'], len(index))
+                v = index.setdefault(connection['to'], len(index))
+                connections[u, v] = connection['weight']
+        nodes = list(index)
+
+        location_index = StopNameIndex((location, location) for location in traffic_lookup.locations)
+        intensity = np.zeros((len(nodes), len(DAYS), HOURS), dtype=np.uint8)
+        coords = np.full((len(nodes), 2), np.nan)
+        for i, node in enumerate(nodes):
+            # Same rule as the traffic import: folded name or a unique substring, never a guess
+            matches = location_index.get(node, unique=True, fuzzy=False)
+            if matches:
+                location = matches[0]
+                intensity[i] = traffic_lookup.for_location(location)
+                if traffic_lookup.coordinates.get(location):
+                    coords[i] = traffic_lookup.coordinates[location][:2]
+
+        edges = np.array(list(connections), dtype=np.int32).reshape(-1, 2)
+        weights = np.array(list(connections.values()), dtype=float)
+        return cls(nodes, edges, weights, intensity, coords, lines, location_index.unmatched)
+
+    def intensities(self, weekday: int, hour: int) -> np.ndarray:
+        """Traffic percent of every stop for a weekday (Monday = 0) and hour"""
+        return self.intensity[:, weekday, hour]
+
+    def lines_of(self, node: str) -> List[str]:
+        return self.lines.get(node, [])
+
+    def graph(self):
+        """Directed graph of the stops (named) with connection weights"""
+        import networkx as nx
+
+        G = nx.DiGraph()
+        G.add_nodes_from(self.nodes)
+        G.add_weighted_edges_from((self.nodes[u], self.nodes[v], weight)
+                                  for (u, v), weight in zip(self.edges.tolist(), self.weights.tolist()))
+        return G
+
+    def layout(self, path: str = 'timeintegration.layout.json') -> np.ndarray:
+        """Spring layout positions (n x 2), computed once and kept in a layout cache"""
+        from graph_layout import LayoutCache
+
+        pos = LayoutCache(path).get(self.graph())
+        return np.array([pos[node] for node in self.nodes], dtype=float).reshape(-1, 2)
+
+
+_networks: Dict[Tuple[str, ...], Tuple[tuple, TrafficNetwork]] = {}
+_networks_lock = threading.Lock()
+
+
+def load_traffic_network(traffic_file: str = TRAFFIC_FILE, edges_file: str = EDGES_FILE,
+                         lines_file: Optional[str] = LINES_FILE,
+                         lines: Optional[Dict[str, List[str]]] = None) -> TrafficNetwork:
+    """Shared TrafficNetwork, rebuilt only when one of its source files or the lines mapping changes.
+
+    A lines mapping (e.g. from tram_stops_and_their_lines.get_lines) replaces lines_file.
+    """
+    if lines is not None:
+        lines_file = None
+    paths = (traffic_file, edges_file, lines_file)
+    signature = tuple(os.stat(path).st_mtime_ns for path in paths if path is not None)
+    with _networks_lock:
+        cached = _networks.get(paths)
+        if cached is None or cached[0] != signature or (lines is not None and cached[1].lines != lines):
+            cached = _networks[paths] = (signature, TrafficNetwork.from_files(*paths, lines=lines))
+        return cached[1]
+
+
+class TrafficNetworkRenderer:
+    """Matplotlib drawing of the network coloured by traffic at a given day and hour.
+
+    Edges, stops and labels are created once; render() only recolours the
+    stops and retitles the plot. For frames (an hour-by-hour day or the 168
+    hours of a week) the edges and the labels, which are most of the drawing
+    time, are rasterised once and each frame only draws the stops and title
+    between them. Without an axes it draws on its own Agg figure, which needs
+    no display.
+    """
+
+    def __init__(self, network: TrafficNetwork, positions: Optional[np.ndarray] = None, ax=None,
+                 lut: Optional[ColorLUT] = None, title: str = "Traffic Intensity Graph for {day} at {hour:02d}:00",
+                 day_names: Sequence[str] = DAYS, labels: bool = True, font_size: int = 12, figsize=(10, 8)):
+        from matplotlib.collections import LineCollection
+
+        self.network = network
+        self.lut = lut or ColorLUT.from_cmap('coolwarm')
+        self.title = title
+        self.day_names = day_names
+        if ax is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            figure = Figure(figsize=figsize)
+            FigureCanvasAgg(figure)
+            ax = figure.add_subplot(111)
+        self.ax = ax
+        self.figure = ax.figure
+        positions = network.layout() if positions is None else positions
+
+        ax.set_axis_off()
+        self.edge_collection = LineCollection(positions[network.edges], colors='black',
+                                              linewidths=network.weights, zorder=1)
+        ax.add_collection(self.edge_collection)
+        self.stops = ax.scatter(positions[:, 0], positions[:, 1], s=500, zorder=2)
+        self.labels = [ax.text(x, y, node, ha='center', va='center', fontsize=font_size, zorder=3)
+                       for node, (x, y) in zip(network.nodes, positions.tolist())] if labels else []
+        self.title_text = ax.set_title("")
+        self._layers = None
+        self._layers_key = None
+
+    def render(self, weekday: int, hour: int):
+        """Recolour for the weekday (Monday = 0) and hour; returns the figure"""
+        self.stops.set_facecolor(self.lut.rgba_for(self.network.intensities(weekday, hour)))
+        self.title_text.set_text(self.title.format(day=self.day_names[weekday], hour=hour))
+        return self.figure
+
+    def _static_layers(self) -> Tuple[object, np.ndarray]:
+        """(background without stops, labels or title; label layer image), redone when the canvas size changes"""
+        from matplotlib.backends.backend_agg import RendererAgg
+
+        canvas = self.figure.canvas
+        key = (canvas.get_width_height(), self.figure.dpi)
+        if self._layers_key != key:
+            dynamic = [self.stops, *self.labels]
+            for artist in dynamic:
+                artist.set_visible(False)
+            # An invisible title is moved out of the figure by the axes, so blank it instead
+            title = self.title_text.get_text()
+            self.title_text.set_text("")
+            canvas.draw()
+            background = canvas.copy_from_bbox(self.figure.bbox)
+            renderer = canvas.get_renderer()
+            layer = RendererAgg(int(renderer.width), int(renderer.height), self.figure.dpi)
+            self.title_text.set_text(title)
+            for artist in dynamic:
+                artist.set_visible(True)
+            for label in self.labels:
+                label.draw(layer)
+            # Agg buffers are stored top row first; draw_image wants bottom row first
+            self._layers = (background, np.asarray(layer.buffer_rgba())[::-1].copy())
+            self._layers_key = key
+        return self._layers
+
+    def frame(self, weekday: int, hour: int) -> np.ndarray:
+        """RGBA image (height x width x 4) of the network at the weekday and hour; needs an Agg-based canvas"""
+        self.render(weekday, hour)
+        background, labels = self._static_layers()
+        canvas = self.figure.canvas
+        canvas.restore_region(background)
+        self.ax.draw_artist(self.stops)
+        if self.labels:
+            renderer = canvas.get_renderer()
+            gc = renderer.new_gc()
+            renderer.draw_image(gc, 0, 0, labels)
+            gc.restore()
+        self.ax.draw_artist(self.title_text)
+        return np.asarray(canvas.buffer_rgba())
+
+    def save_frames(self, out_dir: str, frames: Optional[Iterable[Tuple[int, int]]] = None, fmt: str = 'png',
+                    dpi: Optional[int] = None) -> List[str]:
+        """Render and save each (weekday, hour) frame, by default all 168 hours of the week.
+
+        Raster formats are written straight from the frame buffer; vector
+        formats go through a full savefig per frame.
+        """
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+        if frames is None:
+            frames = [(weekday, hour) for weekday in range(len(DAYS)) for hour in range(HOURS)]
+        if dpi is not None:
+            self.figure.set_dpi(dpi)
+        raster = fmt in ('png', 'jpg', 'jpeg') and isinstance(self.figure.canvas, FigureCanvasAgg)
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+        for weekday, hour in frames:
+            path = os.path.join(out_dir, f"{weekday}_{hour:02d}.{fmt}")
+            if raster:
+                from PIL import Image
+                image = Image.fromarray(self.frame(weekday, hour))
+                if fmt == 'png':
+                    image.save(path)
+                else:
+                    image.convert('RGB').save(path)
+            else:
+                self.render(weekday, hour)
+                self.figure.savefig(path, format=fmt)
+            paths.append(path)
+        return paths
@@ -0,0 +1,120 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from db_handler import TramDatabase
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAY_INDEX = {day: i for i, day in enumerate(DAYS)}
+HOURS = 24
+HOUR_LABELS = [f"{hour:02d}" for hour in range(HOURS)]
+
+
+class TrafficStore:
+    """Dense stops x days x hours float32 view of the traffic_patterns table.
+
+    Missing (stop, day, hour) cells are NaN. The cube is reloaded only when the
+    'traffic' revision counter in the database moves.
+    """
+
+    def __init__(self, db_file='tram_data2.db'):
+        self.db = TramDatabase(db_file)
+        self.revision = None
+        self._lock = threading.Lock()
+        # (stop_ids, stop_index, cube) swapped as one tuple so readers never see a mix
+        self._snapshot = ([], {}, np.full((0, len(DAYS), HOURS), np.nan, dtype=np.float32))
+        self._frame = None
+
+    @property
+    def stop_ids(self) -> List[str]:
+        return self._snapshot[0]
+
+    @property
+    def stop_index(self) -> Dict[str, int]:
+        return self._snapshot[1]
+
+    @property
+    def cube(self) -> np.ndarray:
+        return self._snapshot[2]
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the cube if traffic_patterns changed since the last load"""
+        revision = self.db.get_revision('traffic')
+        if not force and revision == self.revision:
+            return False
+
+        with self._lock:
+            if not force and revision == self.revision:
+                return False
+
+            rows = self.db.get_all_traffic_patterns()
+            stop_ids = sorted({row[0] for row in rows})
+            stop_index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+            cube = np.full((len(stop_ids), len(DAYS), HOURS), np.nan, dtype=np.float32)
+
+            if rows:
+                stop_idx = np.fromiter((stop_index[row[0]] for row in rows), dtype=np.intp, count=len(rows))
+                day_idx = np.fromiter((DAY_INDEX.get(row[1], -1) for row in rows), dtype=np.intp, count=len(rows))
+                hour_idx = np.fromiter((row[2] if row[2] is not None else -1 for row in rows),
+                                       dtype=np.intp, count=len(rows))
+                values = np.fromiter((row[3] for row in rows), dtype=np.float32, count=len(rows))
+
+                valid = (day_idx >= 0) & (hour_idx >= 0) & (hour_idx < HOURS)
+                if not valid.all():
+                    logging.warning(f"Skipping {int((~valid).sum())} traffic rows with unknown day or hour")
+                cube[stop_idx[valid], day_idx[valid], hour_idx[valid]] = values[valid]
+
+            self._snapshot = (stop_ids, stop_index, cube)
+            self._frame = None
+            self.revision = revision
+
+        logging.info(f"Loaded traffic cube for {len(stop_ids)} stops (revision {revision})")
+        return True
+
+    def for_stop(self, stop_id: str) -> Optional[np.ndarray]:
+        """Get the 7 x 24 congestion matrix of a stop, or None if it has no traffic data"""
+        _, stop_index, cube = self._snapshot
+        idx = stop_index.get(stop_id)
+        return cube[idx] if idx is not None else None
+
+    def for_stops(self, stop_ids: Sequence[str]) -> np.ndarray:
+        """Get a k x 7 x 24 block for the given stops, skipping stops without data"""
+        _, stop_index, cube = self._snapshot
+        indices = [stop_index[stop_id] for stop_id in stop_ids if stop_id in stop_index]
+        return cube[indices]
+
+    def to_frame(self):
+        """Long-format DataFrame (Stop ID, Day, Hour, traffic_percent) built from the cube"""
+        import pandas as pd
+
+        snapshot = self._snapshot
+        frame = self._frame
+        if frame is not None and frame[0] is snapshot:
+            return frame[1]
+
+        stop_ids, _, cube = snapshot
+        stop_idx, day_idx, hour_idx = np.nonzero(~np.isnan(cube))
+        df = pd.DataFrame({
+            'Stop ID': np.array(stop_ids, dtype=object)[stop_idx],
+            'Day': np.array(DAYS, dtype=object)[day_idx],
+            'Hour': np.array(HOUR_LABELS, dtype=object)[hour_idx],
+            'traffic_percent': cube[stop_idx, day_idx, hour_idx].astype(np.float64)
+        })
+        self._frame = (snapshot, df)
+        return df
+
+
+_stores: Dict[str, TrafficStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_traffic_store(db_file='tram_data2.db') -> TrafficStore:
+    """Get the shared traffic store for a database, reloading it if the table changed"""
+    with _stores_lock:
+        store = _stores.get(db_file)
+        if store is None:
+            store = _stores[db_file] = TrafficStore(db_file)
+    store.refresh()
+    return store
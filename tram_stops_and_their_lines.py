@@ -1,25 +1,82 @@
 import json
+import os
+import threading
+from typing import Dict, List, Optional, Set, Tuple
 
-def get_lines():
-    tram_routes_path = 'archive/tram_routes.json'
-    with open(tram_routes_path, 'r', encoding='utf-8') as file:
-        tram_routes = json.load(file)
+from db_handler import TramDatabase
 
+TRAM_ROUTES_FILE = 'archive/tram_routes.json'
+STOP_TO_LINES_FILE = 'archive/stop_to_lines.json'
 
-    stop_to_lines = {}
-    for line_number, routes in tram_routes.items():
-        for route in routes:
-            for stop in route:
-                if stop not in stop_to_lines:
-                    stop_to_lines[stop.upper()] = []
-                if line_number not in stop_to_lines[stop.upper()]:
-                    stop_to_lines[stop.upper()].append(line_number)
+# (db file, routes file) -> (source signature, mapping)
+_mappings: Dict[Tuple[str, str], Tuple[tuple, Dict[str, List[str]]]] = {}
+# output path -> signature of the mapping last written to it or found there
+_persisted: Dict[str, tuple] = {}
+_lock = threading.Lock()
 
 
-    for stops in stop_to_lines:
-        stop_to_lines[stops].sort()
+def _add_lines(stop_to_lines: Dict[str, Set[str]], stop: str, lines):
+    stop_to_lines.setdefault(stop.upper(), set()).update(lines)
 
 
-    output_path = 'archive/stop_to_lines.json'
-    with open(output_path, 'w', encoding='utf-8') as file:
-        json.dump(stop_to_lines, file, ensure_ascii=False, indent=4)
+def build_stop_to_lines(db_file: str = 'tram_data2.db', tram_routes_path: str = TRAM_ROUTES_FILE) -> Dict[str, List[str]]:
+    """Upper-case stop name -> sorted line numbers.
+
+    stop_line_relations is the source; archive/tram_routes.json only adds
+    stops the database does not know.
+    """
+    from_routes: Dict[str, Set[str]] = {}
+    if tram_routes_path and os.path.exists(tram_routes_path):
+        with open(tram_routes_path, 'r', encoding='utf-8') as file:
+            tram_routes = json.load(file)
+        for line_number, routes in tram_routes.items():
+            for route in routes:
+                for stop in route:
+                    _add_lines(from_routes, stop, [line_number])
+
+    db = TramDatabase(db_file)
+    names = dict(db.get_stops_with_names_and_ids())
+    from_db: Dict[str, Set[str]] = {}
+    for stop_id, lines in db.get_stop_to_lines_mapping().items():
+        if stop_id in names:
+            _add_lines(from_db, names[stop_id], lines)
+
+    from_routes.update(from_db)
+    return {stop: sorted(lines) for stop, lines in from_routes.items()}
+
+
+def _signature(db_file: str, tram_routes_path: str) -> tuple:
+    try:
+        routes_mtime = os.stat(tram_routes_path).st_mtime_ns
+    except (OSError, TypeError):
+        routes_mtime = None
+    return TramDatabase(db_file).get_revision('network'), routes_mtime
+
+
+def get_lines(db_file: str = 'tram_data2.db', tram_routes_path: str = TRAM_ROUTES_FILE,
+              output_path: Optional[str] = None) -> Dict[str, List[str]]:
+    """Stop name -> lines, held in memory until the network revision or the routes file changes.
+
+    With an output_path (e.g. STOP_TO_LINES_FILE) the mapping is also written
+    there for readers of that file, only when its content would change.
+    """
+    signature = _signature(db_file, tram_routes_path)
+    with _lock:
+        cached = _mappings.get((db_file, tram_routes_path))
+        if cached is None or cached[0] != signature:
+            cached = _mappings[(db_file, tram_routes_path)] = (signature, build_stop_to_lines(db_file, tram_routes_path))
+        stop_to_lines = cached[1]
+
+        if output_path and _persisted.get(output_path) != signature:
+            try:
+                with open(output_path, 'r', encoding='utf-8') as file:
+                    current = json.load(file)
+            except (OSError, ValueError):
+                current = None
+            if current != stop_to_lines:
+                temp_path = f"{output_path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    json.dump(stop_to_lines, file, ensure_ascii=False, indent=4)
+                os.replace(temp_path, output_path)
+            _persisted[output_path] = signature
+        return stop_to_lines
@@ -3,6 +3,8 @@ import os
 import sqlite3
 from typing import Set, Tuple, List, Dict, Optional
 import csv
+from db_handler import TramDatabase
+from network_snapshot import write_snapshot
 
 
 def initialize_database(db_file: str = 'tram_data2.db') -> None:
@@ -17,6 +19,8 @@ def initialize_database(db_file: str = 'tram_data2.db') -> None:
     DROP TABLE IF EXISTS connections;
     DROP TABLE IF EXISTS stops;
     DROP TABLE IF EXISTS tram_lines;
+    DROP TABLE IF EXISTS stats_counters;
+    DROP TABLE IF EXISTS line_stats;
     ''')
 
     # create tables
@@ -241,6 +245,12 @@ def process_tram_lines(root_folder: str, coordinates_file: str, db_file: str = '
 
         # Populate database
         populate_database(conn, all_connections, all_stops, all_line_variants, coordinates)
+        # Recreate the revision/stats triggers dropped with the tables and reseed the counters
+        TramDatabase(db_file).ensure_schema()
+        # New network: invalidate revision-keyed caches and write the startup snapshot
+        conn.execute("UPDATE data_revisions SET revision = revision + 1 WHERE name = 'network'")
+        conn.commit()
+        print(f"Network snapshot written to {write_snapshot(db_file)}")
 
         # Print summary
         cursor = conn.cursor()